@@ -13,9 +13,9 @@ logged_users:  this only contains the currently logged users
 rev 0.1     create
 '''
 
-import copy
 from datetime import datetime, timedelta
 import json
+import logging
 import os
 from typing import Optional, Tuple
 
@@ -27,9 +27,13 @@ import config
 import application.admin.exceptions as exceptions
 
 import application.admin.crypto as crypto
+from application.admin.signed_session import SignedSession, SessionDenylist
 
 
 
+logger = logging.getLogger(__name__)
+
+
 class authorize_user():
     def __init__(self, users_db, log_users):
         self.users_db = users_db
@@ -37,12 +41,22 @@ class authorize_user():
 
         self.crypto = crypto.Crypto()
 
-    def authorize(self, cookie_value, scope='user'):
+        # config.session_mode "signed" keeps the session in the cookie, not in log_users
+        self.signed_sessions = None
+        if config.session_mode == "signed":
+            self.signed_sessions = SignedSession(self.crypto.keys,
+                SessionDenylist(config.session_denylist_file_path_name))
+
+    def authorize(self, cookie_value, scope='user', request: Request = None):
         '''authorize checks authority to enter a page and 
         redirects if user is not authorized for that page
+        pass the request so a signed session cookie can be re-issued
         '''
         # first authenticate the user
-        user_info, username = self.authenticate(cookie_value)
+        if self.signed_sessions is not None:
+            user_info, username = self.authenticate_signed(cookie_value, request)
+        else:
+            user_info, username = self.authenticate(cookie_value)
         
         # #### Scope is verified here
         if scope == 'user':
@@ -64,7 +78,6 @@ class authorize_user():
         uses exceptions if not authenticated
         returns user_info if authenticated
         '''
-        print("\n>>> authenticate <<<")
         # get user user_ID and embedded token from cookie
         if cookie_value is None:
             raise exceptions.NotLoggedInException
@@ -74,19 +87,13 @@ class authorize_user():
             try:
                 username, token = self.crypto.decode_enhanced_token(self.log_users, cookie_value)
             except Exception as e:
-                print(e)
+                logger.debug("auth cookie did not decode: %s", type(e).__name__)
                 # indicates a token of the wrong coding
                 raise exceptions.TokenInvalidException
 
         user_info = self.users_db.get(username)
         user_log = self.log_users.get(username)
 
-        # XXXX DEBUG
-        print(username)
-        print(user_info)
-        print(token)
-        print(user_log)
-
         if user_info == 'no logged user_dict':
             raise exceptions.NotLoggedInException
 
@@ -116,13 +123,38 @@ class authorize_user():
         # check for session timeout
         if elapsed_time >= timedelta(minutes=config.cookie_expire):
             # if expired, delete logged user
-            delete_logged_user(user_ID)
+            self.delete_logged_user(username)
             raise exceptions.SessionTimedOutException
 
         # ### User is logged in and authorized
-        # reset logged time in user log
-        user_log['last_use'] = datetime.now()
-        self.log_users[username] = copy.deepcopy(user_log)
+        # reset logged time in user log (in place, saved by the next log_users.flush())
+        self.log_users.touch(username)
+
+        return user_info, username
+
+
+    def authenticate_signed(self, cookie_value, request: Request = None):
+        '''authenticate for config.session_mode "signed", no log_users lookup
+        If the sliding expiry moved, the new cookie is left in request.state.auth_cookie
+        for the middleware in main.py to set.
+        returns user_info, username like authenticate
+        '''
+        if cookie_value is None:
+            raise exceptions.NotLoggedInException
+
+        session, new_cookie_value = self.signed_sessions.check(cookie_value)
+        username = session["u"]
+
+        user_info = self.users_db.get(username)
+        if user_info is None:
+            raise exceptions.NotLoggedInException
+
+        # scope changed since log in, log in again
+        if user_info.get('scope') != session["s"]:
+            raise exceptions.NotLoggedInException
+
+        if new_cookie_value is not None and request is not None:
+            request.state.auth_cookie = new_cookie_value
 
         return user_info, username
 
@@ -146,32 +178,16 @@ class authorize_user():
         return val
 
 
-    # ### user_log
-    def create_user_index():
-        '''create and pickle a user_index in this format:
-        email.lower(): user_ID
-        '''
-        user_index = {}
-        user_list = db.get_users_db_files()
-        for user_name in user_list:
-            try:
-                user_dict = db.get_user(user_name).dict()
-            except Exception:
-                pass
-            else:
-                email = user_dict.get('email')
-                # create record with email all reduced to lower
-                if email is not None:
-                    user_index[email.lower()] = user_dict.get('user_ID')
-
-        db.save_user_index(user_index)
-
     # ### Logged Users
     def log_user(self, username):
         '''
         logged_users_dict
         user_ID: {token, org-authority, time of last use, persist_data}
+        in config.session_mode "signed" nothing is logged, the cookie is the session
         '''
+        if self.signed_sessions is not None:
+            return self.signed_sessions.create(username, self.users_db.get(username, {}).get('scope'))
+
         basic_token = self.crypto.generate_token()
 
         self.log_users[username] = {
@@ -205,10 +221,18 @@ class authorize_user():
 
 
     def delete_logged_user(self, username):
-        try:
-            del(self.log_users[username]['token'])
-        except KeyError:
-            pass
+        self.log_users.pop(username, None)
+
+
+    def logout_user(self, cookie_value):
+        '''end the session in the cookie, returns the username
+        '''
+        if self.signed_sessions is not None:
+            return self.signed_sessions.revoke(cookie_value)
+
+        username, token = self.crypto.decode_enhanced_token(self.log_users, cookie_value)
+        self.delete_logged_user(username)
+        return username
 
 
 
@@ -16,18 +16,29 @@ import base64
 from cryptography.fernet import Fernet
 from datetime import datetime, timedelta
 import json
+import logging
 import os
 from typing import Optional, Tuple
 
+import config
+import application.admin.exceptions as exceptions
+from application.admin.key_manager import KeyManager
+
 # #### Password security (slow, but better for passwords)
-# the next two lines must be same as used in the login_utility.py
+# login_utility.py imports this context so both hash the same way
+# bcrypt_rounds is set for this host by tools/calibrate_bcrypt.py
 from passlib.context import CryptContext
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.bcrypt_rounds)
+
+
+logger = logging.getLogger(__name__)
 
 
 class Crypto():
-	def __init__(self):
-		pass
+	def __init__(self, key_file_path_name=None):
+		# keys are read once, then only again when key.key is replaced
+		self.keys = KeyManager(key_file_path_name or config.fernet_key_file_path_name,
+			reload_interval=config.fernet_key_reload_interval)
 
 		# ########################
 		# ### Password Hashing ###
@@ -41,6 +52,11 @@ class Crypto():
 	def verify_password(self, plain_password: str, hashed_password: str) -> bool:
 		return pwd_context.verify(plain_password, hashed_password)
 
+	def needs_update(self, hashed_password: str) -> bool:
+		'''True if the hash was made with other than config.bcrypt_rounds (rehash it at the next log in)
+		'''
+		return pwd_context.needs_update(hashed_password)
+
 
 		# ##############
 		# ### Tokens ###
@@ -69,11 +85,8 @@ class Crypto():
 
 		Re-factor 2/24/25 for username
 		'''
-		print("\n>>> decode_enhanced_token <<<")
 		decrypted_token = self.decrypt(enhanced_token)
 
-		print(f"\ndecrypted_token = {decrypted_token}")
-
 		_decode_list = decrypted_token.split(':')
 		if len(_decode_list) == 2:
 			# these need some sort of validation where used
@@ -96,28 +109,30 @@ class Crypto():
 		from cryptography.fernet import Fernet
 		Fernet.generate_key()
 
-		and stores in root key.key
+		and stores in root key.key (see key_manager.py for rotating keys)
 		'''
 
 	def get_key(self) -> bytes:
-		'''opens and returns file key
+		'''returns the primary key
 		'''
-		with open('key.key', "rb") as file:
-			key = file.read()
-
-		return key
+		self.keys.maybe_reload()
+		return self.keys.keys[0]
 
 	def encrypt(self, message: str, key: bytes = None) -> bytes:
-		'''encrypt a string using Fernet key.
+		'''encrypt a string using the primary Fernet key.
 		Returns byte object
 		Must decode() to view
 		'''
-		if key is None: key = self.get_key()
-		return Fernet(key).encrypt(message.encode())
+		if key is not None:
+			return Fernet(key).encrypt(message.encode())
+		return self.keys.primary().encrypt(message.encode())
 
 
 	def decrypt(self, token: bytes, key: bytes = None) -> str:
-		if key is None: key = self.get_key()
-		return Fernet(key).decrypt(token).decode()
+		'''decrypt with any current key, so tokens made before a rotation still work
+		'''
+		if key is not None:
+			return Fernet(key).decrypt(token).decode()
+		return self.keys.all_keys().decrypt(token).decode()
 
 
@@ -10,36 +10,28 @@ special instruction:
 
 '''
 
-import csv
 import pickle
 
 import config
+from application.admin.session_store import SessionStore
+from application.admin.user_store import UserStore
 
 
 class db_disk():
 	def __init__(self):
-		# #### set up users_db as a pickle file
-		# https://stackoverflow.com/questions/6740918/creating-a-dictionary-from-a-csv-file
-
-		input_file = csv.DictReader(open(config.user_db_file_path_name))
-
-		# #### create the users_db dict
-		self.users_db = {}
-		for row in input_file:
-			if row.get("username") != '' and row.get("username") is not None:
-				_username = row.get("username")
-				self.users_db[_username] = {
-					"username": _username,
-					"full_name": row.get("full_name"),
-					"email": row.get("email"),
-					"hashed_password": row.get("hashed_password"),
-					"scope": row.get("scope"),
-					"disabled": row.get("disabled"),
-				}
-
-		# #### load the log_users dict
-		self.log_users = self.load_pickle_file(config.log_users_file_path_name, True)
+		# #### users_db follows db_users.csv, read on first use and again when it changes
+		self.users_db = UserStore(config.user_db_file_path_name,
+			reload_interval=config.user_db_reload_interval)
 
+		# #### load the log_users session store (bounded, written back by flush())
+		self.log_users = SessionStore(config.log_users_file_path_name,
+			idle_seconds=60 * config.cookie_expire, capacity=config.session_capacity)
+
+
+	def update_hashed_password(self, username, hashed_password):
+		'''replace a user's password hash (rehash at log in), see UserStore
+		'''
+		return self.users_db.update_hashed_password(username, hashed_password)
 
 	def pickle_file(self, _data, file_path_name):
 		with open(file_path_name, 'wb') as file:
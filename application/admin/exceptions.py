@@ -37,3 +37,10 @@ class SessionTimedOutException(Exception):
 class AccessNotAuthorizedException(Exception):
     pass
 
+
+class TooManyRequestsException(Exception):
+    '''login rate limit or hash queue full, retry_after is in seconds
+    '''
+    def __init__(self, retry_after=1):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
@@ -0,0 +1,125 @@
+# key_manager.py
+
+'''
+cs50 Tides
+
+AditNW LLC
+Brad Allen
+
+Fernet keys for the auth cookie, loaded once and kept ready to use
+
+key.key holds one key per line, newest first:
+    line 1      primary key, every new token is encrypted with it
+    lines 2..   old keys, tokens made with them still decrypt
+rotate() puts a new key on top so logged in users are not logged out,
+drop the old keys once config.cookie_expire has passed.
+
+Every worker notices a replaced key file within config.fernet_key_reload_interval
+and reloads it.  A key file that will not parse is ignored and the old keys are kept.
+
+rev 0.1     create
+'''
+
+import logging
+import os
+import time
+
+from cryptography.fernet import Fernet, MultiFernet
+
+
+logger = logging.getLogger(__name__)
+
+
+def read_keys(file_path_name):
+    '''keys from a key file, newest first
+    '''
+    with open(file_path_name, "rb") as file:
+        keys = [line.strip() for line in file.read().splitlines() if line.strip()]
+    if not keys:
+        raise ValueError(f"no keys in {file_path_name}")
+    return keys
+
+
+def write_keys(keys, file_path_name):
+    '''write the key file as a temp file then os.replace() so workers never read half of it
+    '''
+    temp_file_path_name = f"{file_path_name}.tmp"
+    with open(temp_file_path_name, "wb") as file:
+        file.write(b"\n".join(keys) + b"\n")
+    os.chmod(temp_file_path_name, 0o600)
+    os.replace(temp_file_path_name, file_path_name)
+
+
+class KeyManager():
+    def __init__(self, file_path_name, reload_interval=1.0):
+        self.file_path_name = file_path_name
+        self.reload_interval = reload_interval
+
+        self.keys = []
+        self.fernet = None          # primary key only, for encrypting
+        self.multi_fernet = None    # every key, for decrypting
+        self._file_id = None
+        self._next_check = 0.0
+
+        self.reload()
+
+    def reload(self):
+        '''read the key file and build the Fernet objects, returns True if the keys were loaded
+        '''
+        stat = os.stat(self.file_path_name)
+        try:
+            keys = read_keys(self.file_path_name)
+            fernets = [Fernet(key) for key in keys]
+        except ValueError as e:
+            if self.fernet is None:
+                raise
+            logger.error("key file %s not loaded, keeping the old keys: %s", self.file_path_name, e)
+            self._file_id = (stat.st_ino, stat.st_mtime_ns)
+            return False
+
+        self.keys = keys
+        self.fernet = fernets[0]
+        self.multi_fernet = MultiFernet(fernets)
+        self._file_id = (stat.st_ino, stat.st_mtime_ns)
+        self._next_check = time.monotonic() + self.reload_interval
+        return True
+
+    def maybe_reload(self):
+        '''reload if the key file was replaced, checks at most once per reload_interval
+        '''
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+
+        try:
+            stat = os.stat(self.file_path_name)
+        except FileNotFoundError:
+            return False
+
+        if (stat.st_ino, stat.st_mtime_ns) == self._file_id:
+            return False
+        return self.reload()
+
+    def primary(self):
+        self.maybe_reload()
+        return self.fernet
+
+    def all_keys(self):
+        self.maybe_reload()
+        return self.multi_fernet
+
+    def rotate(self, keep=2):
+        '''new primary key, the old primary and keep - 1 older keys still decrypt
+        returns the new key
+        '''
+        new_key = Fernet.generate_key()
+        write_keys([new_key] + self.keys[:keep], self.file_path_name)
+        self.reload()
+        return new_key
+
+    def retire(self):
+        '''drop every key except the primary, tokens made with the old keys stop working
+        '''
+        write_keys(self.keys[:1], self.file_path_name)
+        self.reload()
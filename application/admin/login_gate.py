@@ -0,0 +1,190 @@
+# login_gate.py
+
+'''
+cs50 Tides
+
+AditNW LLC
+Brad Allen
+
+Admission control for /login
+
+bcrypt is slow on purpose, a burst of logins (or someone guessing passwords)
+run inline would take every core on the Pi and the tide pages would stall.
+LoginGate puts three things in front of verify_password:
+    rate limits     token buckets per client IP and per username
+    bounded pool    config.login_hash_workers threads only ever hash
+    queue limit     at most config.login_queue_limit logins wait for a thread,
+                    past that the login is rejected at once (429)
+
+Rehashes at log in share the queue limit, one that does not fit is dropped
+(the old hash still works, it is tried again at the next log in).
+
+Behind nginx every request comes from 127.0.0.1, client_ip() takes the
+address from X-Forwarded-For when the request came through one of
+config.login_trusted_proxies, so each phone gets its own bucket.
+
+metrics() gives the queue depth, hash latency and reject counts for /status.
+
+rev 0.1     create
+'''
+
+import asyncio
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import application.admin.exceptions as exceptions
+from application.utilities.metrics import LOGIN_HASH_SECONDS
+
+
+class TokenBucket():
+    def __init__(self, rate, burst, now):
+        self.rate = rate            # tokens per second
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now):
+        '''returns 0 if a token was taken, else seconds until there is one
+        '''
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter():
+    '''a token bucket per key, the least recently used keys are dropped past max_keys
+    '''
+    def __init__(self, per_minute, burst, max_keys=10000):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(self.rate, self.burst, now)
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+            return bucket.take(now)
+
+
+def client_ip(request, trusted_proxies=()):
+    '''the client address for the rate limits
+    from a trusted proxy, the last X-Forwarded-For address the proxies did not add
+    '''
+    client_host = request.client.host if request.client is not None else ""
+    if client_host not in trusted_proxies:
+        return client_host
+
+    forwarded = [address.strip() for address in request.headers.get("x-forwarded-for", "").split(",") if address.strip()]
+    for address in reversed(forwarded):
+        if address not in trusted_proxies:
+            return address
+    return client_host
+
+
+class LoginGate():
+    def __init__(self, verify_password, workers=1, queue_limit=8,
+                 ip_per_minute=10, ip_burst=5, user_per_minute=5, user_burst=5):
+        self.verify_password = verify_password
+        self.workers = workers
+        self.queue_limit = queue_limit
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="login_hash")
+        self.ip_limiter = RateLimiter(ip_per_minute, ip_burst)
+        self.user_limiter = RateLimiter(user_per_minute, user_burst)
+
+        self._lock = threading.Lock()
+        self.in_flight = 0          # hashing or waiting for a thread
+        self.counts = collections.Counter()
+        self.hash_seconds = collections.deque(maxlen=256)
+
+    def admit(self, client_ip, username):
+        '''raise TooManyRequestsException if this client or username is over its rate
+        '''
+        for limiter, key, name in ((self.ip_limiter, client_ip, "rate_limited_ip"),
+                                   (self.user_limiter, username.lower(), "rate_limited_user")):
+            retry_after = limiter.take(key)
+            if retry_after:
+                self.counts[name] += 1
+                raise exceptions.TooManyRequestsException(retry_after)
+
+    async def verify(self, client_ip, username, plain_password, hashed_password):
+        '''verify_password on the bounded pool, after the rate limits
+        raises TooManyRequestsException rather than wait in a long queue
+        '''
+        self.admit(client_ip, username)
+
+        with self._lock:
+            if self.in_flight >= self.workers + self.queue_limit:
+                self.counts["rejected_queue_full"] += 1
+                raise exceptions.TooManyRequestsException(1)
+            self.in_flight += 1
+
+        try:
+            return await asyncio.wrap_future(
+                self.executor.submit(self._timed_verify, plain_password, hashed_password))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _timed_verify(self, plain_password, hashed_password):
+        start = time.perf_counter()
+        try:
+            return self.verify_password(plain_password, hashed_password)
+        finally:
+            seconds = time.perf_counter() - start
+            self.hash_seconds.append(seconds)
+            LOGIN_HASH_SECONDS.observe(seconds)
+            self.counts["verified"] += 1
+
+    def submit(self, function, *args):
+        '''background hashing work (rehash at log in) on the same bounded pool, inside the queue limit
+        returns the future, or None if the queue is full and the work was dropped
+        '''
+        with self._lock:
+            if self.in_flight >= self.workers + self.queue_limit:
+                self.counts["background_dropped"] += 1
+                return None
+            self.in_flight += 1
+        self.counts["background"] += 1
+
+        future = self.executor.submit(function, *args)
+        future.add_done_callback(self._background_done)
+        return future
+
+    def _background_done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def metrics(self):
+        hash_seconds = sorted(self.hash_seconds)
+
+        def percentile(fraction):
+            if not hash_seconds:
+                return None
+            return round(hash_seconds[min(int(fraction * len(hash_seconds)), len(hash_seconds) - 1)], 4)
+
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queue_depth": max(self.in_flight - self.workers, 0),
+            "queue_limit": self.queue_limit,
+            "hash_seconds_p50": percentile(0.5),
+            "hash_seconds_p95": percentile(0.95),
+            **self.counts,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
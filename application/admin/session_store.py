@@ -0,0 +1,163 @@
+# session_store.py
+
+'''
+cs50 Tides
+
+AditNW LLC
+Brad Allen
+
+log_users as a bounded session store
+
+Works like the log_users dict (get, [], in, pop) with:
+    expiry      a min heap of (expiry, username), idle sessions are evicted
+                from the top in O(log n) whenever a session is added or used
+    capacity    at most config.session_capacity sessions, the one idle the
+                longest is dropped to make room
+    persistence changes only mark the store dirty, flush() writes the
+                pickle (atomically) and is run every config.session_flush_seconds
+                by the scheduler in main.py and at shut down
+
+Heap entries are not removed when a session is used again, a stale entry is
+skipped when it reaches the top (its expiry no longer matches the session).
+
+rev 0.1     create
+'''
+
+import heapq
+import os
+import pickle
+import threading
+from datetime import datetime
+
+
+class SessionStore():
+    def __init__(self, file_path_name, idle_seconds, capacity=10000):
+        self.file_path_name = file_path_name
+        self.idle_seconds = idle_seconds
+        self.capacity = capacity
+
+        self.sessions = {}      # username: {token, last_use, persist_data}
+        self._heap = []         # (expiry epoch seconds, username)
+        self._lock = threading.Lock()
+        self.dirty = False
+        self.evicted = 0
+
+        self.load()
+
+    # #### dict like use, as log_users was
+    def get(self, username, default=None):
+        return self.sessions.get(username, default)
+
+    def __getitem__(self, username):
+        return self.sessions[username]
+
+    def __contains__(self, username):
+        return username in self.sessions
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def items(self):
+        return list(self.sessions.items())
+
+    def __setitem__(self, username, session):
+        with self._lock:
+            self.sessions[username] = session
+            self._push(username, session)
+            self.dirty = True
+            self._evict()
+
+    def __delitem__(self, username):
+        if self.pop(username, None) is None:
+            raise KeyError(username)
+
+    def pop(self, username, default=None):
+        with self._lock:
+            session = self.sessions.pop(username, None)
+            if session is None:
+                return default
+            self.dirty = True
+            return session
+
+    # #### sessions
+    def expiry(self, session):
+        return session['last_use'].timestamp() + self.idle_seconds
+
+    def touch(self, username, time=None):
+        '''session used, restart its idle timer in place
+        '''
+        with self._lock:
+            session = self.sessions.get(username)
+            if session is None:
+                return None
+            session['last_use'] = time or datetime.now()
+            self._push(username, session)
+            self.dirty = True
+            self._evict()
+            return session
+
+    def _push(self, username, session):
+        heapq.heappush(self._heap, (self.expiry(session), username))
+
+        # stale entries pile up as sessions are used, rebuild now and then
+        if len(self._heap) > 2 * len(self.sessions) + 64:
+            self._heap = [(self.expiry(_session), _username) for _username, _session in self.sessions.items()]
+            heapq.heapify(self._heap)
+
+    def _evict(self, now=None):
+        '''drop idle sessions, then the longest idle ones while over capacity
+        '''
+        now = now or datetime.now().timestamp()
+        while self._heap:
+            expiry, username = self._heap[0]
+            session = self.sessions.get(username)
+            if session is None or self.expiry(session) != expiry:
+                # removed or used again since this entry was pushed
+                heapq.heappop(self._heap)
+                continue
+            if expiry > now and len(self.sessions) <= self.capacity:
+                break
+            heapq.heappop(self._heap)
+            del self.sessions[username]
+            self.evicted += 1
+            self.dirty = True
+
+    def evict(self):
+        with self._lock:
+            self._evict()
+
+    # #### persistence
+    def load(self):
+        try:
+            with open(self.file_path_name, 'rb') as file:
+                sessions = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            sessions = {}
+
+        if not isinstance(sessions, dict):
+            sessions = {}
+
+        with self._lock:
+            # only whole sessions, older log_users kept entries after the token was deleted
+            self.sessions = {username: session for username, session in sessions.items()
+                             if isinstance(session, dict) and isinstance(session.get('last_use'), datetime)
+                             and session.get('token') is not None}
+            self._heap = [(self.expiry(session), username) for username, session in self.sessions.items()]
+            heapq.heapify(self._heap)
+            self._evict()
+            self.dirty = False
+
+    def flush(self):
+        '''write the sessions if anything changed since the last flush, returns True if written
+        '''
+        with self._lock:
+            if not self.dirty:
+                return False
+            data = pickle.dumps(self.sessions)
+            self.dirty = False
+
+        temp_file_path_name = f"{self.file_path_name}.tmp"
+        with open(temp_file_path_name, 'wb') as file:
+            file.write(data)
+        os.replace(temp_file_path_name, self.file_path_name)
+        return True
@@ -0,0 +1,173 @@
+# signed_session.py
+
+'''
+cs50 Tides
+
+AditNW LLC
+Brad Allen
+
+Stateless sessions for config.session_mode = "signed"
+
+The auth cookie carries the whole session, encrypted and signed with the
+Fernet keys (key_manager.py):
+    u       username
+    s       scope when logged in
+    sid     session id, only used to revoke (log out) a session
+    iat     issued at, epoch seconds
+    lu      last use, epoch seconds
+
+Any worker (or node with the same key.key) checks a cookie with no lookup,
+so nothing is shared but the key file and the denylist.  The expiry slides
+like the log_users timeout: lu is moved forward, and the cookie re-issued,
+at most once every config.session_reissue_seconds.
+
+Log out puts the sid in a small denylist file until the cookie could no
+longer be valid anyway.  Every worker rereads the file when it changes.
+
+rev 0.1     create
+'''
+
+import base64
+import contextlib
+import fcntl
+import json
+import os
+import time
+
+from cryptography.fernet import InvalidToken
+
+import config
+import application.admin.exceptions as exceptions
+
+
+class SessionDenylist():
+    def __init__(self, file_path_name, reload_interval=1.0):
+        self.file_path_name = file_path_name
+        self.reload_interval = reload_interval
+
+        self.denied = {}        # sid: epoch seconds the entry can be dropped
+        self._file_id = None
+        self._next_check = 0.0
+
+    def maybe_reload(self):
+        '''reread if another worker changed the file, checks at most once per reload_interval
+        '''
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+
+        try:
+            stat = os.stat(self.file_path_name)
+        except FileNotFoundError:
+            self.denied = {}
+            return False
+
+        if (stat.st_ino, stat.st_mtime_ns) == self._file_id:
+            return False
+
+        self.denied = self.read()
+        self._file_id = (stat.st_ino, stat.st_mtime_ns)
+        return True
+
+    def read(self):
+        try:
+            with open(self.file_path_name) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    @contextlib.contextmanager
+    def lock(self):
+        with open(f"{self.file_path_name}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def add(self, sid, until):
+        '''deny sid until epoch seconds, expired entries are dropped on each write
+        '''
+        with self.lock():
+            now = time.time()
+            denied = {_sid: _until for _sid, _until in self.read().items() if _until > now}
+            denied[sid] = until
+
+            temp_file_path_name = f"{self.file_path_name}.tmp"
+            with open(temp_file_path_name, 'w') as file:
+                json.dump(denied, file)
+            os.replace(temp_file_path_name, self.file_path_name)
+
+        self.denied = denied
+        self._next_check = 0.0
+
+    def is_denied(self, sid):
+        self.maybe_reload()
+        return sid in self.denied
+
+
+class SignedSession():
+    def __init__(self, keys, denylist):
+        self.keys = keys            # KeyManager
+        self.denylist = denylist
+
+    def create(self, username, scope):
+        '''cookie value for a new session
+        '''
+        now = int(time.time())
+        session = {
+            "u": username,
+            "s": scope,
+            "sid": base64.urlsafe_b64encode(os.urandom(9)).decode(),
+            "iat": now,
+            "lu": now,
+        }
+        return self.encode(session)
+
+    def encode(self, session):
+        return self.keys.primary().encrypt(json.dumps(session, separators=(",", ":")).encode())
+
+    def decode(self, cookie_value):
+        '''session dict from a cookie, TokenInvalidException if it was not made with our keys
+        '''
+        try:
+            session = json.loads(self.keys.all_keys().decrypt(cookie_value))
+        except (InvalidToken, TypeError, ValueError):
+            raise exceptions.TokenInvalidException
+
+        if not isinstance(session, dict) or not {"u", "s", "sid", "iat", "lu"} <= session.keys():
+            raise exceptions.TokenInvalidException
+        return session
+
+    def check(self, cookie_value):
+        '''returns (session, new cookie value or None)
+        raises if the session is invalid, logged out or timed out
+        '''
+        session = self.decode(cookie_value)
+        now = time.time()
+
+        if self.denylist.is_denied(session["sid"]):
+            raise exceptions.NotLoggedInException
+
+        if now - session["lu"] >= 60 * config.cookie_expire:
+            raise exceptions.SessionTimedOutException
+
+        if now - session["iat"] >= 3600 * config.session_max_age_hours:
+            raise exceptions.SessionTimedOutException
+
+        # slide the expiry, but not on every request
+        new_cookie_value = None
+        if now - session["lu"] >= config.session_reissue_seconds:
+            session["lu"] = int(now)
+            new_cookie_value = self.encode(session)
+
+        return session, new_cookie_value
+
+    def revoke(self, cookie_value):
+        '''log out, the cookie stops working on every worker
+        '''
+        session = self.decode(cookie_value)
+        # no cookie with this sid can be used later than cookie_expire from now
+        self.denylist.add(session["sid"], int(time.time()) + 60 * config.cookie_expire + 1)
+        return session["u"]
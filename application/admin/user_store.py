@@ -0,0 +1,176 @@
+# user_store.py
+
+'''
+cs50 Tides
+
+AditNW LLC
+Brad Allen
+
+users_db as an indexed table that follows db_users.csv
+
+    username    dict key, O(1) get
+    email       case insensitive index, get_by_email()
+
+The csv is read on first use, not at import, and read again when the file
+is replaced (checked at most once per reload_interval), so editing the user
+list with user_login_utility.py needs no restart.  A new table is built
+beside the old one and swapped in with one assignment, requests never see
+half a table.
+
+rev 0.1     create
+'''
+
+import contextlib
+import csv
+import fcntl
+import logging
+import os
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# db_users.csv columns, in order
+USERS_DB_FIELDS = ["username", "full_name", "email", "hashed_password", "scope", "disabled"]
+
+
+class UserStore():
+    def __init__(self, file_path_name, reload_interval=1.0):
+        self.file_path_name = file_path_name
+        self.reload_interval = reload_interval
+
+        self._tables = None         # (users, email_index), swapped whole
+        self._file_id = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    # #### dict like use, as users_db was
+    def get(self, username, default=None):
+        return self.tables()[0].get(username, default)
+
+    def __getitem__(self, username):
+        return self.tables()[0][username]
+
+    def __contains__(self, username):
+        return username in self.tables()[0]
+
+    def __len__(self):
+        return len(self.tables()[0])
+
+    def values(self):
+        return self.tables()[0].values()
+
+    def items(self):
+        return self.tables()[0].items()
+
+    def get_by_email(self, email, default=None):
+        username = self.tables()[1].get(email.strip().casefold())
+        if username is None:
+            return default
+        return self.get(username, default)
+
+    # #### loading
+    def tables(self):
+        if self._tables is None:
+            self.reload()
+        else:
+            self.maybe_reload()
+        return self._tables
+
+    def read(self):
+        '''(users, email_index) from the csv
+        '''
+        users = {}
+        email_index = {}
+        with open(self.file_path_name, newline='') as file:
+            for row in csv.DictReader(file):
+                _username = row.get("username")
+                if _username == '' or _username is None:
+                    continue
+
+                users[_username] = {field: row.get(field) for field in USERS_DB_FIELDS}
+
+                _email = (row.get("email") or '').strip().casefold()
+                if _email:
+                    if _email in email_index:
+                        logger.warning("%s is used by %s and %s, log in by email goes to %s",
+                                       _email, email_index[_email], _username, email_index[_email])
+                    else:
+                        email_index[_email] = _username
+        return users, email_index
+
+    def reload(self):
+        with self._lock:
+            stat = os.stat(self.file_path_name)
+            self._tables = self.read()
+            self._file_id = (stat.st_ino, stat.st_mtime_ns)
+            self._next_check = time.monotonic() + self.reload_interval
+        return True
+
+    def maybe_reload(self):
+        '''reload if db_users.csv was replaced or edited, checks at most once per reload_interval
+        '''
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+
+        try:
+            stat = os.stat(self.file_path_name)
+        except FileNotFoundError:
+            return False
+
+        if (stat.st_ino, stat.st_mtime_ns) == self._file_id:
+            return False
+        try:
+            return self.reload()
+        except (OSError, csv.Error) as e:
+            # caught mid edit, keep the old table and try again next time
+            logger.warning("%s not reloaded: %s", self.file_path_name, e)
+            return False
+
+    # #### writing
+    @contextlib.contextmanager
+    def file_lock(self):
+        '''blocking lock across processes on db_users.csv.lock, as refresh_lock() is for the tides cache
+        '''
+        with open(f"{self.file_path_name}.lock", 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def update_hashed_password(self, username, hashed_password):
+        '''replace a user's password hash (rehash at log in) and write db_users.csv
+        the csv is read again under the file lock and only this user's row is changed, so an edit
+        or another worker's rehash since the last reload is kept.  It is written to a temp file
+        then os.replace(), it is never left half written
+        '''
+        with self._lock, self.file_lock():
+            with open(self.file_path_name, newline='') as file:
+                reader = csv.DictReader(file)
+                fieldnames = reader.fieldnames or USERS_DB_FIELDS
+                rows = list(reader)
+
+            for row in rows:
+                if row.get("username") == username:
+                    row["hashed_password"] = hashed_password
+                    break
+            else:
+                return False
+
+            temp_file_path_name = f"{self.file_path_name}.{os.getpid()}.tmp"
+            try:
+                with open(temp_file_path_name, 'w', newline='') as file:
+                    writer = csv.DictWriter(file, fieldnames=fieldnames)
+                    writer.writeheader()
+                    writer.writerows(rows)
+                os.replace(temp_file_path_name, self.file_path_name)
+            except OSError:
+                if os.path.exists(temp_file_path_name):
+                    os.remove(temp_file_path_name)
+                raise
+
+        return self.reload()
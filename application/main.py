@@ -14,6 +14,8 @@ notes on use:
 - both are fully contained in the db_disk_utility object db_disk
 
 IMPORTANT:  reboot nightly on RPi using a crontab timer
+- startup never waits on NOAA, a tide cache that falls short of the refresh
+  horizon is served (stale, see /ready) while it refreshes in the background
 
 copyright 2025, MIT License, AditNW LLC
 
@@ -24,8 +26,13 @@ revisions are in config
 '''
 
 
+import logging
+import math
 import os
+import secrets
+import time
 from typing import Optional
+from urllib.parse import quote
 from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 
@@ -39,7 +46,6 @@ from fastapi.encoders import jsonable_encoder
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordRequestForm
 
-from starlette.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import markdown as mk
 
@@ -48,35 +54,160 @@ import config
 import application.admin.exceptions as exceptions
 from application.admin.db_disk_utility import db_disk
 import application.admin.auth as auth
+from application.admin.login_gate import LoginGate, client_ip
 from application.utilities.NOAA_tides import NOAA_TIDES
+from application.utilities.tide_store import TideStore, write_tide_store
+from application.utilities.tide_snapshot import TideSnapshot
+import application.utilities.tide_render as tide_render
+from application.utilities.response_cache import ResponseCache
+from application.utilities.prerender import PRERENDER
+from application.utilities.asset_manifest import AssetManifest
+import application.utilities.water_svg as water_svg
+from application.utilities.static_assets import STATIC_ASSETS
+from application.utilities.log_setup import setup_logging
+import application.utilities.metrics as metrics
+from application.utilities.profiler import ProfileMiddleware
 
 
 
 
+# #### logging first, records go through a queue so requests never wait on stdout
+setup_logging(config.log_level)
+logger = logging.getLogger(__name__)
+
+# seconds from here (the worker starting) to ready and to the first request served, for /ready
+BOOT_TIME = time.monotonic()
+startup = {"ready_seconds": None, "first_request_seconds": None}
+tide_refresh = {"running": False, "last_finished": None}
+
 # #### set up global objects
 db = db_disk()
 
 tides = NOAA_TIDES(db)
 
+# rendered tide pages, cleared whenever a new tide store is mapped
+response_cache = ResponseCache()
+
 # users_db is static and contains non-changeable user data including pass hash
 authorize = auth.authorize_user(db.users_db, db.log_users)
 
+# bcrypt for /login runs on its own small pool behind rate limits
+login_gate = LoginGate(authorize.crypto.verify_password,
+    workers=config.login_hash_workers, queue_limit=config.login_queue_limit,
+    ip_per_minute=config.login_ip_per_minute, ip_burst=config.login_ip_burst,
+    user_per_minute=config.login_user_per_minute, user_burst=config.login_user_burst)
+
+# unknown usernames are verified against this so they take as long as a wrong password
+# (a random password, nothing typed in matches it)
+DUMMY_HASHED_PASSWORD = authorize.crypto.hash_password(secrets.token_urlsafe(16))
+
+
+def update_tides_cache(tide_data=None):
+    '''get NOAA data and pickle it
+    with config.NOAA_refresh_incremental only the days missing from tide_data are requested
+    Only one worker refreshes at a time, the others skip and remap the new file when it lands.
+    returns True if the cache was written, False if another worker is refreshing or every station failed
+    '''
+    with tides.refresh_lock() as locked:
+        if not locked:
+            logger.info("Another worker is refreshing the tides cache")
+            return False
+
+        logger.info("Retrieving NOAA data")
+        with metrics.NOAA_REFRESH_SECONDS.time():
+            if config.NOAA_refresh_incremental and isinstance(tide_data, dict):
+                stations_tide_dict, high_water_marks, errors = tides.update_stations_tides_dict(tide_data)
+            else:
+                (stations_tide_dict, errors), high_water_marks = tides.create_stations_tides_dict(), None
+            if not stations_tide_dict or tides.fetch_failed(errors):
+                # NOAA down, keep serving the old cache with its old date
+                logger.error("NOAA refresh failed for every station, the tides cache was not replaced")
+                return False
+
+            # some stations failed, keep the old date so the cache does not look refreshed
+            _date = tide_data.get("date") if errors and isinstance(tide_data, dict) else None
+            tide_data = tides.create_tide_data_file(stations_tide_dict, high_water_marks, _date)
+            _flag = tides.cache_tide_data(tide_data)
+
+        if errors:
+            logger.warning("Tides cache updated without %s", ", ".join(errors))
+        else:
+            logger.info("Tides cache retrieved and pickle up to date")
+        return True
+
+
+
+def load_tide_snapshot():
+    '''precompute the per minute page values, rebuilt whenever a new tide store is mapped
+    '''
+    if app.tide_snapshot is None or app.tide_snapshot.generation != app.tide_store.generation:
+        app.tide_snapshot = TideSnapshot(app.tide_store.stations, app.tide_store.generation)
+    return app.tide_snapshot
+
 
-def update_tides_cache():
-    print("- Retrieving NOAA data")
-    stations_tide_dict = tides.create_stations_tides_dict()
-    tide_data = tides.create_tide_data_file(stations_tide_dict)
-    _flag = tides.cache_tide_data(tide_data)
-    print("- Tides cache retrieved and pickle up to date")
+def get_tide_page(station, time=None):
+    '''returns (water_photo_name, tide_dict) for tide.html, None if the station has no data
+    uses the snapshot table, computing directly if time is outside it
+    '''
+    app.tide_store.maybe_reload()
+
+    _tide_page = load_tide_snapshot().get(station, time)
+    if _tide_page is not None:
+        return _tide_page
+
+    _station_index = app.tide_store.get(station)
+    if _station_index is None or len(_station_index) < 2:
+        return None
+
+    if time is None:
+        time = datetime.now()
+    _current_tide_height = round(tides.get_current_tide_height(_station_index, time), 1)
+    _next_tide_dict = _station_index.next_event(time) or _station_index.event(-1)
+
+    return tide_render.create_tide_dict(_current_tide_height, _next_tide_dict)
 
 
 
-# Nightly, update the tides cache
+def tides_stale():
+    '''True if there are no tides or a station's tides do not reach the horizon a refresh gives
+    (the cache date is not used, a refresh that failed for some stations keeps the old one)
+    '''
+    return not app.tide_store.loaded or tides.tides_stale(app.tide_store.stations)
+
+
+# Nightly (or per config.NOAA_refresh_schedule), update the tides cache
+# requests keep getting the old tides until reload() swaps the new store in
 def scheduled_task():
-    print(f"Task executed at {datetime.now()}")
+    logger.info("Scheduled tides refresh")
+    tide_refresh["running"] = True
+    try:
+        update_tides_cache(tides.get_tide_cache())
+        app.tide_store.reload()
+        load_tide_snapshot()
+    finally:
+        tide_refresh["running"] = False
+        tide_refresh["last_finished"] = datetime.now()
+
+# At startup and every config.stale_refresh_minutes, refresh if the tides fall short of the horizon
+# (boot after a missed refresh, or a nightly refresh during a NOAA outage)
+def refresh_if_stale():
+    # another worker may have refreshed already
+    app.tide_store.maybe_reload()
+    if tides_stale():
+        scheduled_task()
+
+# Every minute, write the tide pages for nginx to serve
+def prerender_task():
+    _count = prerender.render_stations(app.tide_store.stations, get_tide_page)
+    if _count:
+        logger.info("Prerendered %d tide pages", _count)
 
 scheduler = BackgroundScheduler()
-scheduler.add_job(scheduled_task, 'cron', hour=1, minute=0)
+scheduler.add_job(scheduled_task, 'cron', **config.NOAA_refresh_schedule)
+# write the logged users back in batches, not on every request
+scheduler.add_job(db.log_users.flush, 'interval', seconds=config.session_flush_seconds)
+if config.prerender_enabled:
+    scheduler.add_job(prerender_task, 'cron', second=0)
 scheduler.start()
 
 
@@ -85,35 +216,116 @@ scheduler.start()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # STARTUP
-    print(f'\n\n>>> start FastAPI: {datetime.now()} <<<')
-
-    # On startup, check for tide_cache, update if not for today
-    print("\n>>> Set up tides cache")
-    app.tide_data = tides.get_tide_cache() 
-    if isinstance(app.tide_data, str):
-        print("- No tide cache pickle file, creating up to date pickle file")
-        # indicates no cache file, so create it
-        update_tides_cache()
-    elif isinstance(app.tide_data, dict) and app.tide_data.get("date").date() != datetime.now().date():
-        update_tides_cache()
+    logger.info("start FastAPI")
+
+    # On startup, map the tide store, serve it even if it is stale
+    # the store is shared by every worker, only the refresh needs the pickle
+    logger.info("Set up tides cache")
+    app.tide_store = TideStore(config.tides_store_filepathname)
+    if not app.tide_store.loaded:
+        tide_data = tides.get_tide_cache()
+        if isinstance(tide_data, dict):
+            logger.info("Creating tide store from the tide cache pickle")
+            write_tide_store(tide_data, config.tides_store_filepathname)
+            app.tide_store.reload()
+
+    if not app.tide_store.loaded:
+        logger.warning("No tide cache file, no tides until the background refresh lands")
+    elif tides_stale():
+        logger.warning("Tide cache from %s falls short, serving it while it refreshes in the background",
+                       app.tide_store.date)
+    else:
+        logger.info("Tide cache was already up to date")
+
+    app.tide_snapshot = None
+    load_tide_snapshot()
+
+    if config.prerender_enabled:
+        prerender_task()
+    elif prerender.clear():
+        # left from when prerender was on, nginx would keep serving them
+        logger.info("Removed the prerendered tide pages, prerender is off")
+
+    # NOAA is never waited on here, the refresh runs on the scheduler now and again while still stale
+    if config.stale_refresh_minutes:
+        scheduler.add_job(refresh_if_stale, 'interval', minutes=config.stale_refresh_minutes,
+                          next_run_time=datetime.now(), id="refresh_if_stale", replace_existing=True)
+
+    startup["ready_seconds"] = round(time.monotonic() - BOOT_TIME, 3)
+    if startup["ready_seconds"] > config.startup_warn_seconds:
+        logger.warning("ready to serve in %.2f s, over config.startup_warn_seconds", startup["ready_seconds"])
     else:
-        print("- Tide cache was already for today")
+        logger.info("ready to serve in %.2f s", startup["ready_seconds"])
 
     yield
     # SHUT DOWN
     # Clean up scheduler events
     scheduler.shutdown()
+    prerender.stop()
+    db.log_users.flush()
+    login_gate.shutdown()
 
     # and shutdown
-    print(f'\n\n>>> shutdown FastAPI: {datetime.now()} <<<')
+    logger.info("shutdown FastAPI")
 
 
 # ### Start FastAPI
 app = FastAPI(lifespan=lifespan)
 
+
+# request counts and latency per route for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+def profile_allowed(scope):
+    '''a request may ask for a profile if its user is logged in with one of config.profile_scopes
+    '''
+    _request = Request(scope)
+    try:
+        user_info = authorize.authorize(authorize.get_auth_cookie_data(_request), None, _request)
+    except (exceptions.NotLoggedInException, exceptions.SessionTimedOutException,
+            exceptions.TokenInvalidException, exceptions.TokenExpiredException):
+        return False
+    return user_info.get('scope') in config.profile_scopes
+
+
+# signed sessions (config.session_mode) leave a re-issued cookie in request.state
+@app.middleware("http")
+async def reissue_auth_cookie(request: Request, call_next):
+    response = await call_next(request)
+    if startup["first_request_seconds"] is None:
+        startup["first_request_seconds"] = round(time.monotonic() - BOOT_TIME, 3)
+        logger.info("first request served %.2f s after start", startup["first_request_seconds"])
+    _auth_cookie = getattr(request.state, "auth_cookie", None)
+    if _auth_cookie is not None:
+        auth_cookie(response, _auth_cookie)
+    return response
+
+
+# profiles of single requests, each middleware is added in front of the ones before it
+# so this is registered after every other middleware (reissue_auth_cookie included) to see the whole request
+if config.profile_enabled:
+    app.add_middleware(ProfileMiddleware, directory=config.profile_directory, allowed=profile_allowed,
+        sample_every=config.profile_sample_every, keep=config.profile_keep, interval=config.profile_interval)
+
+
 # configure global pathes and objects
-app.mount('/static', StaticFiles(directory='application/static'), name='static')
+# /static with content hashed URLs (immutable) and .br/.gz siblings, see static_assets.py
+static_assets = STATIC_ASSETS(directory='application/static', url_path='/static')
+app.mount('/static', static_assets, name='static')
 templates = Jinja2Templates(directory="application/templates")
+templates.env.globals["static_url"] = static_assets.static_url
+
+# composited tide images from tools/build_assets.py, tide.html falls back to the png layers without it
+asset_manifest = AssetManifest(config.asset_manifest_filepathname)
+templates.env.globals["tide_image"] = asset_manifest.tide_image
+
+# "svg" draws the water at the current height instead of the nearest oceanN.png
+templates.env.globals["water_layer"] = config.water_layer
+templates.env.globals["water_svg_url"] = water_svg.water_svg_url
+
+# static tide pages for nginx, see prerender.py for the nginx config
+prerender = PRERENDER(config.prerender_directory, templates.get_template("tide.html"))
 
 
 
@@ -127,101 +339,155 @@ templates = Jinja2Templates(directory="application/templates")
 @app.get('/index/{message}')
 @app.get('/login')
 def index(request: Request, message: str = None):
-    print("\n>>> index GET start<<<<\n")
+    logger.debug("index GET")
     # #### authenticate
     required_scope = "user"
     cookie_value = authorize.get_auth_cookie_data(request)
-    user_info = authorize.authorize(cookie_value, required_scope)
+    user_info = authorize.authorize(cookie_value, required_scope, request)
     # end authenticate
 
-    print("\n>>> index GET end<<<<\n")
-
     return templates.TemplateResponse("index.html", {"request": request,
         'user_info': user_info})
 
 @app.get('/tide/{station}')
-def tide(request: Request, station: str = None):
-    print("\n>>> endpoint: tide<<<<\n")
+def tide(request: Request, station: str = None, mode: str = None):
+    '''mode=client (or config.tide_render_mode) sends tide_client.html, the browser
+    then draws the page from the day's JSON instead of polling the server
+    '''
+    logger.debug("tide %s", station)
     if station is None:
         return "no station in url"
-    
-    _station_data = tides.parse_station_tide_data(app.tide_data, station)
 
-    print("\n>>> _station_data")
-    for key, data in _station_data.items():
-        print(f"{key}: {data}")
+    if (mode or config.tide_render_mode) == "client":
+        return tide_client(request, station)
 
+    # the page only changes each minute (the snapshot bucket) or when a new tide store is mapped
+    _now = time.time()
+    _bucket = int(_now // 60)
+    _max_age = 60 - int(_now % 60)
+    app.tide_store.maybe_reload()
+    _cached_page = response_cache.get(station, _bucket, app.tide_store.generation)
+    if _cached_page is not None:
+        return response_cache.response(request, _cached_page, _max_age)
 
-    if isinstance(_station_data, str):
-        if _station_data == "no station data":
-            return "This station is not in the data base or did not have current NOAA data"
+    _tide_page = get_tide_page(station)
 
-    _current_tide_height = round(tides.get_current_tide_height(_station_data), 1)
-    _next_tide_text = tides.get_next_tide_string(_station_data)
+    if _tide_page is None:
+        return "This station is not in the data base or did not have current NOAA data"
 
-    print("\n_next_tide_text:")
-    print(_next_tide_text)
+    water_photo_name, _tide_dict = _tide_page
 
-    _next_tide_height = int(float(_next_tide_text.split("\'")[0]))
-    _next_tide_text_position = 115 * int(_next_tide_height + 6)
-    _current_tide_text_position = 115 * int(_current_tide_height + 6) - 200
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("tide %s: %s %s", station, water_photo_name, _tide_dict)
 
-    # scale for screen size
-    _ratio = 1800 / 2556
-    _next_tide_text_position = int(_ratio * _next_tide_text_position)
-    _current_tide_text_position = int(_ratio * _current_tide_text_position)
 
-    if "High" in _next_tide_text:
-        _next_tide = "high"
-        _next_tide_text_color = "black"
-    else:
-        _next_tide = "low"
-        _next_tide_text_color = "white"
+    _response = templates.TemplateResponse("tide.html", {"request": request,
+        'water_photo_name': water_photo_name, 'tide_dict': _tide_dict})
 
+    _cached_page = response_cache.put(station, _bucket, _response.body, _bucket * 60)
+    return response_cache.response(request, _cached_page, _max_age)
 
 
-    if _current_tide_height >= 15:
-        water_photo_name = "ocean15.png"
-    elif -4 < _current_tide_height < 0:
-        water_photo_name = f"ocean-{abs(_current_tide_heigh)}.png"
-    elif _current_tide_height <= -4:
-        water_photo_name = "ocean-4.png"
-    else:
-        water_photo_name = f"ocean{_current_tide_height:.0f}.png"
+def get_day_payload(station, day):
+    '''cached JSON for one station and day, None if the station has no data for that day
+    only days inside the station's tides are cached, so the cache holds at most stations x days in the store
+    '''
+    app.tide_store.maybe_reload()
+    _key = ("day", station, day)
+    _cached_payload = response_cache.get(_key, day.toordinal(), app.tide_store.generation)
+    if _cached_payload is not None:
+        return _cached_payload
 
-    
+    _station_index = app.tide_store.get(station)
+    if _station_index is None or len(_station_index) < 2:
+        return None
+    if not _station_index.event(0)['time'].date() <= day <= _station_index.event(-1)['time'].date():
+        return None
 
-    _tide_dict = {
-        "current tide height": _current_tide_height,
-        "current tide text position": _current_tide_text_position,
-        "next tide": _next_tide,
-        "next tide text": f"---- {_next_tide_text} -------",
-        "next tide text position": _next_tide_text_position,
-        "next tide text color": _next_tide_text_color,
-    }
+    _water_svg = None
+    if config.water_layer == "svg":
+        _water_svg = {"version": water_svg.WATER_SVG_VERSION,
+                      "min": water_svg.WATER_SVG_MIN, "max": water_svg.WATER_SVG_MAX}
 
-    # XXX DEBUG
+    _body = tide_render.create_day_payload(station, _station_index, day, _water_svg)
+    return response_cache.put(_key, day.toordinal(), _body, time.time(), media_type="application/json")
+
+
+def tide_client(request: Request, station: str):
+    '''tide page drawn in the browser, the page only changes once a day
     '''
-    print(f"\n>>> DEBUG tide - END:")
-    print(f"water_photo_name: {water_photo_name}")
-    print("_tide_dict:")
-    for key, data in _tide_dict.items():
-        print(f"{key}: {data}")
+    _today = datetime.now().date()
+    _payload = get_day_payload(station, _today)
+    if _payload is None:
+        return "This station is not in the data base or did not have current NOAA data"
+
+    _key = ("client", station)
+    _max_age = (datetime.combine(_today, datetime.max.time()) - datetime.now()).total_seconds()
+    _cached_page = response_cache.get(_key, _today.toordinal(), app.tide_store.generation)
+    if _cached_page is None:
+        _data_url = f"/tide/{quote(station)}/day/{_today.isoformat()}.json?v={response_cache.fingerprint(_payload)}"
+        _water_photo_urls = {_name: static_assets.static_url(f"img-site/{_name}")
+                             for _name in map(tide_render.water_photo_name,
+                                              range(tide_render.WATER_PHOTO_MIN, tide_render.WATER_PHOTO_MAX + 1))}
+        _response = templates.TemplateResponse("tide_client.html", {"request": request,
+            'data_url': _data_url, 'water_photo_urls': _water_photo_urls})
+        _cached_page = response_cache.put(_key, _today.toordinal(), _response.body, time.time())
+
+    return response_cache.response(request, _cached_page, _max_age)
+
+
+@app.get('/tide/{station}/day/{day}.json')
+def tide_day(request: Request, station: str, day: str, v: str = None):
+    '''the day's tides and layout constants for tide_client.html
+    v is the content fingerprint, a matching v is cached by the browser for good
     '''
+    try:
+        _day = datetime.strptime(day, "%Y-%m-%d").date()
+    except ValueError:
+        return JSONResponse({"error": "day must be YYYY-MM-DD"}, status_code=status.HTTP_400_BAD_REQUEST)
 
+    _payload = get_day_payload(station, _day)
+    if _payload is None:
+        return JSONResponse({"error": "no data for this station and day"}, status_code=status.HTTP_404_NOT_FOUND)
 
-    return templates.TemplateResponse("tide.html", {"request": request,
-        'water_photo_name': water_photo_name, 'tide_dict': _tide_dict})
+    _fingerprint = response_cache.fingerprint(_payload)
+    if v != _fingerprint:
+        # stale or missing fingerprint, send them to the current version
+        return RedirectResponse(f"/tide/{quote(station)}/day/{day}.json?v={_fingerprint}",
+                                status_code=status.HTTP_302_FOUND)
+
+    return response_cache.response(request, _payload, 0, immutable=True)
+
+
+@app.get('/water/v{version}/{height}.svg')
+def water(version: str, height: str):
+    '''svg water layer for a 0.1 ft height bucket, the URL never changes content
+    '''
+    try:
+        _height = float(height)
+    except ValueError:
+        return Response(status_code=status.HTTP_400_BAD_REQUEST)
+    if not math.isfinite(_height):
+        # nan, inf and -inf parse as floats but have no bucket
+        return Response(status_code=status.HTTP_400_BAD_REQUEST)
+
+    _url = water_svg.water_svg_url(_height)
+    if _url != f"/water/v{version}/{height}.svg":
+        # old version or not a bucket, send them to the one that is cached
+        return RedirectResponse(_url, status_code=status.HTTP_301_MOVED_PERMANENTLY)
+
+    return Response(content=water_svg.create_water_svg(_height), media_type="image/svg+xml",
+                    headers={"Cache-Control": "public, max-age=31536000, immutable"})
 
 
 @app.get('/test')
 def test(request: Request):
-    print("\n>>> test protected path<<<<\n")
+    logger.debug("test protected path")
 
     # #### authenticate
     required_scope = "user"
     cookie_value = authorize.get_auth_cookie_data(request)
-    user_info = authorize.authorize(cookie_value, required_scope)
+    user_info = authorize.authorize(cookie_value, required_scope, request)
     # end authenticate
 
     return "successfully got protected path"
@@ -236,43 +502,66 @@ def auth_cookie(response: Response, val):
     IMPORTANT: httponly=True is important for server, but does not work localhost
     This is set in config so it can be different in the server vs locahost
     '''
-    print("\n>>>> auth cookie endpoint <<<")
     response.set_cookie(config.auth_cookie_name, val, secure=False,
                 httponly=config.cookie_HTTP_only, samesite='Lax')
 
 
+def rehash_password(username, plain_password):
+    '''new hash at the current bcrypt_rounds, saved to db_users.csv
+    '''
+    _hashed_password = authorize.crypto.hash_password(plain_password)
+    if db.update_hashed_password(username, _hashed_password):
+        logger.info("Rehashed password for %s", username)
+
+
+def log_rehash_failure(future):
+    '''rehash_password runs after the response, nothing else would see it fail
+    '''
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Rehash failed, the old hash is kept", exc_info=future.exception())
+
+
 @app.post('/login')
-def login(request: Request, data: OAuth2PasswordRequestForm = Depends()):
+async def login(request: Request, data: OAuth2PasswordRequestForm = Depends()):
     # username and password are part of the OAuth2 standard
     # convert email to lower (this should be the only place it is typed in)
     username = data.username
     input_password = data.password
 
-    print('\n\n#### login ####')
-    print(f"username: {username}, input_password: {input_password}")
-
-    # get user info
-    user_info = db.users_db.get(username)
-    
+    # the phone's address, not nginx's, for the per IP rate limit
+    _client_ip = client_ip(request, config.login_trusted_proxies)
 
-    print("user_info:")
-    for key, value in user_info.items():
-        print(f"{key}: {value}")
-    print()
+    # get user info, by username or (any case) email
+    user_info = db.users_db.get(username) or db.users_db.get_by_email(username)
+    if user_info is None:
+        # hash anyway so the response time does not tell which usernames exist
+        await login_gate.verify(_client_ip, username, input_password, DUMMY_HASHED_PASSWORD)
+        logger.info("login failed, no such user")
+        raise exceptions.InvalidCredentialsException
+    username = user_info["username"]
 
 
     # ### validate password ###
-    # verify password
-    valid_password = authorize.crypto.verify_password(input_password, user_info.get("hashed_password"))
-    
+    # verify password, on the login pool (429 if over the rate limits or the queue is full)
+    valid_password = await login_gate.verify(_client_ip, username,
+        input_password, user_info.get("hashed_password"))
+
 
     if valid_password is False:
-        print("\n!!! pass did not verify")
+        logger.info("login failed for %s, password did not verify", username)
         raise exceptions.InvalidCredentialsException
 
+    # hash made with other than config.bcrypt_rounds, rehash it on the login pool after the response
+    # (dropped if the login queue is full, it is tried again at the next log in)
+    if authorize.crypto.needs_update(user_info.get("hashed_password")):
+        _future = login_gate.submit(rehash_password, username, input_password)
+        if _future is not None:
+            _future.add_done_callback(log_rehash_failure)
+
     # ### log user
     # this includes creating the basic_token and enhanced_token
     enhanced_access_token = authorize.log_user(username)
+    logger.info("login %s", username)
 
 
     # ### Create and set cookie
@@ -293,9 +582,7 @@ def logout(request: Request):
     cookie_value = authorize.get_auth_cookie_data(request)
     if cookie_value is None:
         return exceptions.NotLoggedInException
-    username, token = authorize.crypto.decode_enhanced_token(db.log_users, cookie_value)
-
-    authorize.delete_logged_user(username)
+    authorize.logout_user(cookie_value)
     raise exceptions.NotLoggedInException
 
     ###################################
@@ -306,7 +593,57 @@ def logout(request: Request):
 def get_status():
     '''Get server status information.
     '''
-    return ({"status":  "running"})
+    return ({"status":  "running", "login": login_gate.metrics()})
+
+
+@app.get("/ready")
+def get_ready(response: Response):
+    '''Readiness and tide freshness, 503 until there are tides to serve (stale tides are served)
+    '''
+    _tide_store = app.tide_store
+    if not _tide_store.loaded:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    _tides_until = tides.tides_until(_tide_store.stations)
+
+    return {
+        "ready": _tide_store.loaded,
+        "stale": tides_stale(),
+        "refreshing": tide_refresh["running"],
+        "tides_date": _tide_store.date.isoformat() if _tide_store.date else None,
+        "tides_age_seconds": tide_cache_age(),
+        "tides_until": _tides_until.isoformat() if _tides_until else None,
+        "last_refresh_finished": tide_refresh["last_finished"].isoformat() if tide_refresh["last_finished"] else None,
+        "ready_seconds": startup["ready_seconds"],
+        "first_request_seconds": startup["first_request_seconds"],
+    }
+
+
+# values kept elsewhere are read when /metrics is scraped
+def tide_cache_age():
+    _tide_store = getattr(app, "tide_store", None)
+    if _tide_store is None or _tide_store.date is None:
+        return None
+    return round((datetime.now() - _tide_store.date).total_seconds(), 1)
+
+metrics.Gauge("tides_cache_age_seconds", "age of the mapped tide store", function=tide_cache_age)
+metrics.Gauge("tides_cache_stale", "1 while the tides served fall short of the refresh horizon",
+              function=lambda: int(tides_stale()) if hasattr(app, "tide_store") else None)
+metrics.Gauge("tides_ready_seconds", "seconds from start to ready to serve", function=lambda: startup["ready_seconds"])
+metrics.Counter("tides_page_cache_hits_total", "rendered tide pages served from the response cache",
+                function=lambda: response_cache.hits)
+metrics.Counter("tides_page_cache_misses_total", "tide pages rendered because the response cache missed",
+                function=lambda: response_cache.misses)
+metrics.Gauge("tides_active_sessions", "logged in sessions held by this worker",
+              function=lambda: len(db.log_users))
+metrics.Gauge("tides_login_in_flight", "logins hashing or waiting for the login pool",
+              function=lambda: login_gate.in_flight)
+
+
+@app.get("/metrics")
+def get_metrics():
+    '''Prometheus text format, for this worker only
+    '''
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
 
 
     #######################################
@@ -374,6 +711,15 @@ def exception_handler(request: Request, exc: exceptions.TokenInvalidException) -
     return response
 
 
+@app.exception_handler(exceptions.TooManyRequestsException)
+def exception_handler(request: Request, exc: exceptions.TooManyRequestsException) -> Response:
+    message = 'Too many log in attempts, please wait a minute and try again'
+    return templates.TemplateResponse("login.html", {"request": request,
+        'message': message, 'revision': config.rev},
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))})
+
+
 @app.exception_handler(exceptions.SessionTimedOutException)
 def exception_handler(request: Request, exc: exceptions.SessionTimedOutException) -> Response:
     message = 'Your session timed out, you need to log back in'
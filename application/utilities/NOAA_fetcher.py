@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+'''
+file name:  NOAA_fetcher.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Fetches hi/lo predictions for many stations at once from the NOAA CO-OPS
+    datagetter API.  Requests run on a bounded thread pool and share one
+    requests.Session so TLS connections are kept alive and reused.
+
+special instruction:
+    config settings:
+        NOAA_api_url                datagetter url, point at tools/noaa_stub.py to test
+        NOAA_fetch_concurrency      number of stations fetched at the same time
+        NOAA_fetch_timeout          seconds, per request (connect and read)
+        NOAA_fetch_retries          retries on connection errors and 429/5xx
+        NOAA_fetch_backoff          backoff factor between retries (seconds)
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import config
+
+
+class NOAA_FETCHER():
+    def __init__(self, api_url=None, concurrency=None, timeout=None, retries=None, backoff=None):
+        self.api_url = api_url or config.NOAA_api_url
+        self.concurrency = concurrency or config.NOAA_fetch_concurrency
+        self.timeout = timeout or config.NOAA_fetch_timeout
+        self.retries = config.NOAA_fetch_retries if retries is None else retries
+        self.backoff = config.NOAA_fetch_backoff if backoff is None else backoff
+
+        self.session = self.create_session()
+
+        # {station name: seconds} for the last fetch_stations, includes retries
+        self.latency = {}
+        # {station name: bytes} of NOAA JSON received by the last fetch_stations
+        self.response_bytes = {}
+
+    def create_session(self):
+        '''one keep alive connection pool sized to the concurrency
+        '''
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, max_retries=retry)
+
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def get_predictions(self, station_ID, begin_date, time_range):
+        '''Return the NOAA JSON for one station
+        time_range is in hours
+        '''
+        return self.request_predictions(station_ID, begin_date, time_range)[0]
+
+    def request_predictions(self, station_ID, begin_date, time_range):
+        '''returns (NOAA JSON, bytes received) for one station
+        '''
+        params = {
+            "datum": "mllw",
+            "begin_date": begin_date,
+            "range": time_range,
+            "product": "predictions",
+            "interval": "hilo",
+            "format": "json",
+            "units": "english",
+            "time_zone": "lst_ldt",
+            "station": station_ID,
+        }
+
+        response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+
+        # use requests built in error handling
+        response.raise_for_status()
+
+        tide_data = response.json()
+
+        # NOAA reports bad stations or dates as a 200 with an error message
+        if "predictions" not in tide_data:
+            raise ValueError(f"NOAA error for station {station_ID}: {tide_data.get('error')}")
+
+        return tide_data, len(response.content)
+
+    def _timed_get_predictions(self, station_ID, begin_date, time_range):
+        '''returns (tide_data, error, seconds, bytes), never raises so one station cannot stop the rest
+        '''
+        start = time.perf_counter()
+        try:
+            (tide_data, nbytes), error = self.request_predictions(station_ID, begin_date, time_range), None
+        except (requests.RequestException, ValueError) as e:
+            tide_data, nbytes, error = None, 0, e
+        return tide_data, error, time.perf_counter() - start, nbytes
+
+    def fetch_stations(self, stations_dict, begin_date, time_range):
+        '''fetch every station in stations_dict ({station name: station_ID}) concurrently
+        for the same begin_date and time_range (hours)
+
+        returns (results, errors), see fetch_requests
+        '''
+        return self.fetch_requests({station: (station_ID, begin_date, time_range)
+                                    for station, station_ID in stations_dict.items()})
+
+    def fetch_requests(self, requests_dict):
+        '''fetch {station name: (station_ID, begin_date, time_range)} concurrently
+
+        returns (results, errors)
+            results:  {station name: NOAA JSON}
+            errors:  {station name: exception} for stations that failed after retries
+        per station fetch times (seconds, including retries) are left in self.latency
+        and bytes received in self.response_bytes
+        '''
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {station: executor.submit(self._timed_get_predictions, *request)
+                       for station, request in requests_dict.items() if request[0] is not None}
+
+        results = {}
+        errors = {}
+        self.latency = {}
+        self.response_bytes = {}
+        for station, future in futures.items():
+            tide_data, error, seconds, nbytes = future.result()
+            self.latency[station] = seconds
+            self.response_bytes[station] = nbytes
+            if error is None:
+                results[station] = tide_data
+            else:
+                errors[station] = error
+
+        return results, errors
+
+    def close(self):
+        self.session.close()
@@ -19,16 +19,25 @@ Current Station Map:  https://tidesandcurrents.noaa.gov/map/index.html#
 __revision__ = 'v0.0.1'
 __status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
 
+import contextlib
 import datetime
-import json
+import fcntl
+import logging
 import math
 import pickle
 
 import pandas as pd
-import requests
-from requests.exceptions import HTTPError
 
 import config
+from application.utilities.NOAA_fetcher import NOAA_FETCHER
+from application.utilities.metrics import NOAA_FETCH_BYTES, NOAA_FETCH_ERRORS, NOAA_FETCH_SECONDS
+from application.utilities.tide_curve import TideCurve
+from application.utilities.tide_index import TideIndex
+from application.utilities.tide_store import write_tide_store
+import application.utilities.tide_render as tide_render
+
+
+logger = logging.getLogger(__name__)
 
 
 class NOAA_TIDES():
@@ -37,44 +46,150 @@ class NOAA_TIDES():
         self.stations_dict = config.NOAA_tide_stations
         self.db = db
 
+        # shared keep alive connection pool for all NOAA requests
+        self.fetcher = NOAA_FETCHER()
+
     def create_stations_tides_dict(self):
         ''' Cache a single file with tide dict that starts day before at midnight
         and goes for number of days set in __init__
+        Stations are fetched concurrently, a station that fails is left out and reported.
+
+        returns (stations_tides_dict, errors), errors is {station name: exception}
         '''
         start_datetime = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%Y%m%d")
         time_range = 24 * self.cache_days
 
+        results, errors = self.fetcher.fetch_stations(self.stations_dict, start_datetime, time_range)
+        self.report_fetch(errors)
+
+        stations_tides_dict = {}
+        for station, tide_data in results.items():
+            stations_tides_dict[station] = self.parse_tide_prediction(tide_data)
+
+        return stations_tides_dict, errors
+
+    def update_stations_tides_dict(self, tides_data):
+        '''Incremental version of create_stations_tides_dict
+        Only requests the days past each station's high water mark (last cached tide),
+        merges them into the cached tides and trims tides older than the retention window.
+
+        returns (stations_tides_dict, high_water_marks, errors)
+        a station that failed keeps its cached tides, errors is {station name: exception}
+        '''
+        today = datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        horizon_start = today - datetime.timedelta(days=1)
+        horizon_end = horizon_start + datetime.timedelta(days=self.cache_days)
+        retention_start = today - datetime.timedelta(days=config.NOAA_data_retention_days)
+
+        if isinstance(tides_data, dict):
+            cached_stations = tides_data.get("stations_tides_dict", {})
+            high_water_marks = dict(tides_data.get("high_water_marks", {}))
+        else:
+            cached_stations = {}
+            high_water_marks = {}
+
+        # #### work out what each station is missing
+        requests_dict = {}
+        for station, station_ID in self.stations_dict.items():
+            high_water_mark = high_water_marks.get(station)
+            if high_water_mark is None and cached_stations.get(station):
+                high_water_mark = max(_tide['time'] for _tide in cached_stations[station].values())
+
+            if high_water_mark is None or high_water_mark < horizon_start:
+                begin = horizon_start
+            else:
+                # start just after the last cached tide, merge drops any repeats
+                begin = high_water_mark + datetime.timedelta(minutes=1)
+
+            time_range = math.ceil((horizon_end - begin).total_seconds() / 3600)
+            if time_range > 0:
+                requests_dict[station] = (station_ID, begin.strftime("%Y%m%d %H:%M"), time_range)
+
+        results, errors = self.fetcher.fetch_requests(requests_dict)
+        self.report_fetch(errors)
+
+        # #### merge, de-duplicate on time and trim
         stations_tides_dict = {}
+        for station in self.stations_dict:
+            new_tides = self.parse_tide_prediction(results[station]) if station in results else {}
+            tide_dict = self.merge_tide_dicts(cached_stations.get(station, {}), new_tides, retention_start)
+            if tide_dict:
+                stations_tides_dict[station] = tide_dict
+                high_water_marks[station] = tide_dict[f"tide_{len(tide_dict) - 1}"]['time']
+
+        return stations_tides_dict, high_water_marks, errors
+
+    def required_horizon(self, now=None):
+        '''the last tide a fresh cache reaches past
+        a refresh covers yesterday + cache_days, the last hi/lo lands a few hours short
+        of that, so one day of slack.  A missed nightly refresh drops below it.
+        '''
+        today = (now or datetime.datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        return today + datetime.timedelta(days=self.cache_days - 2)
 
+    def tides_until(self, stations):
+        '''time of the last tide of the configured station that runs out first
+        None if a station has no tides, stations is {station name: TideIndex} (TideStore.stations)
+        '''
+        last_tides = []
         for station in self.stations_dict:
-            station_ID = self.stations_dict.get(station, None)
-            if station_ID is not None:
-                stations_tides_dict[station] = self.get_tide_prediction(station_ID, start_datetime, time_range)
+            tide_index = stations.get(station)
+            if tide_index is None or len(tide_index) == 0:
+                return None
+            last_tides.append(tide_index.event(-1)['time'])
+        return min(last_tides, default=None)
+
+    def tides_stale(self, stations, now=None):
+        '''True if a configured station has no tides or its tides end before required_horizon()
+        '''
+        tides_until = self.tides_until(stations)
+        return tides_until is None or tides_until < self.required_horizon(now)
 
-        return stations_tides_dict
+    def fetch_failed(self, errors):
+        '''True if every station requested in the last fetch failed (NOAA down)
+        '''
+        return bool(errors) and len(errors) >= len(self.fetcher.latency)
 
-    def get_tide_prediction(self, station_ID, begin_date=datetime.datetime.now().strftime("%Y%m%d"), time_range=config.NOAA_data_cache_days):
-        '''Return JSON from NOAA and convert to a tide dict
+    def merge_tide_dicts(self, cached_tide_dict, new_tide_dict, retention_start=None):
+        '''merge two tide dicts for one station, newer data wins for the same time
+        tides before retention_start are dropped, returns a renumbered tide dict
         '''
-        url = "&".join(('https://tidesandcurrents.noaa.gov/api/datagetter?datum=mllw',
-                        f"begin_date={begin_date}",
-                        f"range={time_range}",
-                        f"product={'predictions'}",
-                        f"interval={'hilo'}",
-                        f"format=json",
-                        f"units={'english'}",
-                        f"time_zone=lst_ldt",
-                        f"station={station_ID}",
-                        ))
+        tides_by_time = {_tide['time']: _tide for _tide in cached_tide_dict.values()}
+        tides_by_time.update({_tide['time']: _tide for _tide in new_tide_dict.values()})
 
-        response = requests.get(url)
+        tide_dict = {}
+        for _time in sorted(tides_by_time):
+            if retention_start is not None and _time < retention_start:
+                continue
+            tide_dict[f"tide_{len(tide_dict)}"] = tides_by_time[_time]
 
-        # use requests built in error handling
-        response.raise_for_status()
+        return tide_dict
 
-        # load json into data object
-        tide_data = json.loads(response.text)
+    def report_fetch(self, errors):
+        '''log per station fetch times and failures from the last fetch, and add them to /metrics
+        '''
+        for station, seconds in self.fetcher.latency.items():
+            nbytes = self.fetcher.response_bytes.get(station, 0)
+            NOAA_FETCH_SECONDS.observe(seconds, station)
+            NOAA_FETCH_BYTES.inc(station, amount=nbytes)
+            logger.info("NOAA %s: %.2f s %d bytes", station, seconds, nbytes)
+        for station, error in errors.items():
+            NOAA_FETCH_ERRORS.inc(station)
+            logger.error("NOAA fetch failed for %s: %s", station, error)
+
+    def get_tide_prediction(self, station_ID, begin_date=None, time_range=config.NOAA_data_cache_days):
+        '''Return JSON from NOAA and convert to a tide dict
+        '''
+        if begin_date is None:
+            begin_date = datetime.datetime.now().strftime("%Y%m%d")
 
+        tide_data = self.fetcher.get_predictions(station_ID, begin_date, time_range)
+
+        return self.parse_tide_prediction(tide_data)
+
+    def parse_tide_prediction(self, tide_data):
+        '''convert NOAA JSON predictions to a tide dict
+        '''
         tide_dict = {}
 
         for count, _tide_dict in enumerate(tide_data.get("predictions")):
@@ -93,95 +208,107 @@ class NOAA_TIDES():
 
         return tide_dict
 
-    def create_tide_data_file(self, stations_tides_dict):
+    def create_tide_data_file(self, stations_tides_dict, high_water_marks=None, date=None):
         '''creates a dict with date and duration
+        high_water_marks:  {station: time of last cached tide}, used by incremental refresh
+        date:  when the tides were fetched, now if None
         '''
+        if high_water_marks is None:
+            high_water_marks = {station: max(_tide['time'] for _tide in tide_dict.values())
+                                for station, tide_dict in stations_tides_dict.items() if tide_dict}
+
         return {
             "stations_tides_dict": stations_tides_dict,
-            "date": datetime.datetime.now(),
+            "date": date or datetime.datetime.now(),
             "duration_days": config.NOAA_data_cache_days,
+            "high_water_marks": high_water_marks,
         }
 
     def cache_tide_data(self, tide_dict):
         '''standard method for caching the tide data
+        the pickle is the refresh job's copy, the columnar store is what the workers serve from
         '''
         self.db.pickle_file(tide_dict, config.tides_cache_filepathname)
+        write_tide_store(tide_dict, config.tides_store_filepathname)
         return True
 
     def get_tide_cache(self):
         return self.db.load_pickle_file(config.tides_cache_filepathname)
 
+    @contextlib.contextmanager
+    def refresh_lock(self):
+        '''non blocking lock across processes, yields True if this process got it
+        keeps several uvicorn workers from refreshing (and writing the cache) at once
+        '''
+        with open(f"{config.tides_store_filepathname}.lock", 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
     def parse_station_tide_data(self, tides_data, station_name):
         '''parse a full tides_data dict to one station's predictions
         '''
         station_tide_data = tides_data.get("stations_tides_dict", "no tide data").get(station_name, "no station data")
         return station_tide_data
 
-    def get_next_tide_string(self, tide_dict, time=None):
+    def create_tide_indexes(self, tides_data):
+        '''returns {station_name: TideIndex} for a full tides_data dict
+        build once when the cache loads, then use for every lookup
+        '''
+        stations_tides_dict = tides_data.get("stations_tides_dict", {})
+        return {station_name: TideIndex.from_station_dict(tide_dict)
+                for station_name, tide_dict in stations_tides_dict.items()}
+
+    def get_next_tide_string(self, tide_index, time=None):
         '''returns display string telling type of tide and height
-        IMPORTANT:  the input here is the data for one station, stations_tides must be parsed down to a station using
-        parse station data.
+        IMPORTANT:  the input here is the TideIndex for one station (a single station's
+        tide dict also works but is indexed on every call).
         '''
-        print(">>>> get_next_tide_string <<<")
+        if not isinstance(tide_index, TideIndex):
+            tide_index = TideIndex.from_station_dict(tide_index)
 
         # note:  you cannot dynamically assign a default value in the function because the default will be assigned when the 
         # class inits, not each time it runs.
-
         if not isinstance(time, datetime.datetime):
             time = datetime.datetime.now()
-        print(f"will use this time: {time}")
-        print(f"datatime.datetime.now(): {datetime.datetime.now()}")
-        # #### Find which two tides you are between
-        previous_key = 0
-        for key, value in tide_dict.items():
-            print(f'{key}: {value}')
-            if time <= value.get('time'):
-                break
 
-            previous_key = key
+        # past the end of the data use the last tide
+        next_tide_dict = tide_index.next_event(time) or tide_index.event(-1)
 
-        next_tide = tide_dict.get(key)['type']
-        next_tide_time = tide_dict.get(key)['time']
-        next_tide_height = float(tide_dict.get(key)['height'])
+        return tide_render.next_tide_text(next_tide_dict)
 
-        if next_tide == 'H':
-            next_tide = 'High'
-        else:
-            next_tide = 'Low'
-
-        tide_string = f"{next_tide_height:.1f}\' {next_tide} at {datetime.datetime.strftime(next_tide_time, '%-I:%M %p')}"
-
-        return tide_string
-
-    def get_current_tide_height(self, tide_dict):
-        '''XXXX needs work
-        How to get data for first tide after midnight and last tide of day
+    def get_current_tide_height(self, tide_index, time=None):
+        '''interpolates the height between the tides before and after time
+        IMPORTANT:  the input here is the TideIndex for one station (a single station's
+        tide dict also works but is indexed on every call).
+        Before the first or after the last tide the height is held at that tide.
         '''
-        # #### Find which two tides you are between
-        previous_key = 0
-        for key, value in tide_dict.items():
-            #print(f'{key}: {value}')
-            if datetime.datetime.now() <= value.get('time'):
-                break
-
-            previous_key = key
+        if not isinstance(tide_index, TideIndex):
+            tide_index = TideIndex.from_station_dict(tide_index)
 
-        #print(f'\ntide is betwen {previous_key} and {key}')
+        if not isinstance(time, datetime.datetime):
+            time = datetime.datetime.now()
 
-        # #### Deal with first tide period after midnight
-        if previous_key == 0:
-            tide_dict[0] = previous_tide_data
+        # #### Find which two tides you are between
+        start_tide_dict, end_tide_dict = tide_index.bracket(time)
 
+        # #### Deal with times outside the cached data
+        if start_tide_dict is None:
+            return end_tide_dict['height']
+        if end_tide_dict is None:
+            return start_tide_dict['height']
 
-        # use keys to get tides at start and finish of 
-        start_tide_dict = tide_dict[previous_key]
-        end_tide_dict = tide_dict[key]
-        
-        minutes_span = int(((end_tide_dict.get('time') - start_tide_dict.get('time')).total_seconds()/60))
+        minutes_span = (end_tide_dict['time'] - start_tide_dict['time']).total_seconds() / 60
 
-        tide_minutes = int(((datetime.datetime.now() - start_tide_dict.get('time')).total_seconds()/60))
+        tide_minutes = (time - start_tide_dict['time']).total_seconds() / 60
 
-        tide_span = float(end_tide_dict.get('height')) - float(start_tide_dict.get('height'))
+        tide_span = end_tide_dict['height'] - start_tide_dict['height']
 
         # determine which portion of sine wave to use
         sine_offset = 1.5
@@ -197,10 +324,16 @@ class NOAA_TIDES():
         sine_x = (math.sin(i) + 1.0) / 2
 
         # use the sine and the full tide span to get the current height
-        tide_height = (sine_x * tide_span) + float(start_tide_dict.get('height'))
+        tide_height = (sine_x * tide_span) + start_tide_dict['height']
 
         return tide_height
 
+    def create_tide_curve(self, tide_dict):
+        '''returns a TideCurve for one station's tide dict, use for batches of heights
+        IMPORTANT:  the input here is the data for one station, same as get_current_tide_height
+        '''
+        return TideCurve.from_station_dict(tide_dict)
+
 
 
 
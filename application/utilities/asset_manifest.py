@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+'''
+file name:  asset_manifest.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Reads the manifest written by tools/build_assets.py and gives tide.html
+    the srcset for the pre-composited beach + water image.
+
+special instruction:
+    If the build step has not been run there is no manifest, tide_image()
+    returns None and the template falls back to the two png layers.
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import json
+
+
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+class AssetManifest():
+    def __init__(self, file_path_name):
+        self.file_path_name = file_path_name
+        self.pages = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.file_path_name) as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            self.pages = {}
+            return False
+
+        # #### build the template values once, not per request
+        pages = {}
+        for water_photo_name, page in manifest.get("pages", {}).items():
+            sources = []
+            for image_format in manifest.get("formats", []):
+                srcset = ", ".join(f"{source['url']} {source['width']}w" for source in page[image_format])
+                sources.append({"type": MIME_TYPES[image_format], "srcset": srcset})
+
+            # the last format is the one every browser can show
+            fallback = page[manifest["formats"][-1]]
+            pages[water_photo_name] = {
+                "sources": sources[:-1],
+                "srcset": sources[-1]["srcset"],
+                "src": fallback[-1]["url"],
+            }
+
+        self.pages = pages
+        return True
+
+    def tide_image(self, water_photo_name):
+        '''{'sources': [{'type', 'srcset'}], 'srcset', 'src'} for a water image, None if not built
+        '''
+        return self.pages.get(water_photo_name)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+'''
+file name:  log_setup.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Logging for the app.  Modules log to their own logger
+    (logging.getLogger(__name__)), the records go on a queue and one
+    listener thread writes them out, so a request never waits on stdout /
+    journald.  Records below config.log_level are dropped before they are
+    formatted.
+
+special instruction:
+    setup_logging() is called once when main.py is imported, it is safe to
+    call again.  Set config.log_level = "DEBUG" to see the per request detail.
+    Never log passwords, tokens or password hashes.
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# loggers set up here, the rest (uvicorn, apscheduler) are left alone
+APP_LOGGERS = ("application", "__main__")
+
+_listener = None
+
+
+def setup_logging(level="INFO", stream=None):
+    '''queue handler on the app loggers and a listener thread writing to stream (stderr)
+    returns the QueueListener
+    '''
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+
+    for name in APP_LOGGERS:
+        logger = logging.getLogger(name)
+        logger.setLevel(level)
+        # a second setup after stop_logging() replaces the old handler
+        for handler in list(logger.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+
+    stream_handler = logging.StreamHandler(stream or sys.stderr)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    '''write out what is still queued and stop the listener thread
+    '''
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
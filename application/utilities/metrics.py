@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+'''
+file name:  metrics.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Counters, gauges and histograms for /metrics in the Prometheus text
+    format, plus an ASGI middleware that counts and times every request by
+    route.  The app's metrics are defined at the bottom of this file and
+    updated where the work is done (NOAA fetch, login hashing, ...).
+
+special instruction:
+    Each metric has its own lock, held only for an add, so the instrumented
+    code never waits on another metric.  Values that already exist elsewhere
+    (cache age, sessions, cache hits) are read when /metrics is scraped
+    with Gauge(function=...), nothing is added to their hot path.
+    Every uvicorn worker has its own numbers, a scrape sees one worker.
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import bisect
+import math
+import threading
+import time
+
+
+# seconds, for request and fetch timings
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(labelnames, labelvalues, extra=()):
+    pairs = list(zip(labelnames, labelvalues)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Registry():
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        '''every metric in the Prometheus text format
+        '''
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class Counter():
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY, function=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.function = function    # returns the total when scraped, for counts kept elsewhere
+        self.values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        if self.function is not None:
+            return [f"{self.name} {format_value(self.function())}"]
+        with self._lock:
+            values = list(self.values.items())
+        return [f"{self.name}{format_labels(self.labelnames, labelvalues)} {format_value(value)}"
+                for labelvalues, value in values]
+
+
+class Gauge():
+    type = "gauge"
+
+    def __init__(self, name, help, labelnames=(), registry=REGISTRY, function=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.function = function    # returns the value when scraped, None to leave it out
+        self.values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def set(self, value, *labelvalues):
+        with self._lock:
+            self.values[labelvalues] = value
+
+    def samples(self):
+        if self.function is not None:
+            value = self.function()
+            return [] if value is None else [f"{self.name} {format_value(value)}"]
+        with self._lock:
+            values = list(self.values.items())
+        return [f"{self.name}{format_labels(self.labelnames, labelvalues)} {format_value(value)}"
+                for labelvalues, value in values]
+
+
+class Histogram():
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.values = {}            # labelvalues: [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self.values.get(labelvalues)
+            if counts is None:
+                counts = self.values[labelvalues] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def time(self, *labelvalues):
+        '''with metric.time(labels): times the block
+        '''
+        return _Timer(self, labelvalues)
+
+    def samples(self):
+        with self._lock:
+            values = [(labelvalues, list(counts)) for labelvalues, counts in self.values.items()]
+
+        lines = []
+        for labelvalues, counts in values:
+            cumulative = 0
+            for upper, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = (("le", format_value(float(upper))),)
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            labels = format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {format_value(counts[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class _Timer():
+    def __init__(self, histogram, labelvalues):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+        return False
+
+
+class MetricsMiddleware():
+    '''ASGI middleware, request count and latency by route template (/tide/{station}, not each station)
+    '''
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = scope.get("route")
+            # a mount (/static) leaves its path in root_path, anything else unmatched is "other"
+            path = route.path if route is not None else (scope.get("root_path") or "other")
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, path)
+            HTTP_REQUESTS.inc(path, scope["method"], str(status[0]))
+
+
+# #### the app's metrics
+HTTP_REQUESTS = Counter("tides_http_requests_total", "HTTP requests", ("route", "method", "status"))
+HTTP_REQUEST_SECONDS = Histogram("tides_http_request_seconds", "HTTP request latency", ("route",))
+
+NOAA_FETCH_SECONDS = Histogram("tides_noaa_fetch_seconds", "NOAA predictions fetch time per station, including retries",
+                               ("station",), buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+NOAA_FETCH_BYTES = Counter("tides_noaa_fetch_bytes_total", "NOAA predictions bytes received", ("station",))
+NOAA_FETCH_ERRORS = Counter("tides_noaa_fetch_errors_total", "NOAA station fetches that failed after retries", ("station",))
+NOAA_REFRESH_SECONDS = Histogram("tides_noaa_refresh_seconds", "whole tides cache refresh time",
+                                 buckets=(1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+
+LOGIN_HASH_SECONDS = Histogram("tides_login_hash_seconds", "bcrypt verify time on the login pool",
+                               buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0))
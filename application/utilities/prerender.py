@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+'''
+file name:  prerender.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Writes the tide.html page for every station to a directory so nginx can
+    serve it without touching Python.  Run every minute by the scheduler in
+    main.py when config.prerender_enabled is True.
+
+special instruction:
+    Pages are written to <prerender_directory>/tide/<station>.html with a
+    temp file and os.replace(), so nginx never reads half a page.  A page is
+    only rewritten when its content changes.
+
+    One uvicorn worker writes the pages, the first to take the lock file
+    <prerender_directory>/tide.lock keeps it until it stops, the others keep
+    trying each minute and one takes over if it goes.  The writer removes the
+    pages when it shuts down, and main.py removes any left over at startup
+    when prerender is off, so nginx never serves a frozen "current" tide.
+
+    nginx (inside the server block), falls back to FastAPI if there is no file:
+        location /tide/ {
+            root /home/home/cs50_tides/db_disk/prerender;
+            default_type text/html;
+            add_header Cache-Control "max-age=30";
+            try_files $uri.html @fastapi;
+        }
+        location @fastapi {
+            proxy_pass http://127.0.0.1:8000;
+            proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+        }
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import fcntl
+import hashlib
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+def write_file_atomic(file_path_name, body):
+    '''write bytes to a temp file in the same directory then rename over the target
+    '''
+    temp_file_path_name = f"{file_path_name}.{os.getpid()}.tmp"
+    with open(temp_file_path_name, 'wb') as file:
+        file.write(body)
+    os.replace(temp_file_path_name, file_path_name)
+
+
+class PRERENDER():
+    def __init__(self, directory, template):
+        '''template:  the jinja2 template for tide.html
+        '''
+        self.directory = os.path.join(directory, "tide")
+        self.template = template
+
+        # {station: sha1 of the last page written}
+        self.written = {}
+
+        # open and locked while this process is the one writing the pages
+        self._lock_file = None
+
+    def page_path(self, station):
+        return os.path.join(self.directory, f"{station}.html")
+
+    def render_stations(self, stations, get_tide_page, time=None):
+        '''render every station, get_tide_page(station, time) returns (water_photo_name, tide_dict)
+        returns the number of pages written, 0 if another worker is writing them
+        '''
+        if not self.take_writer():
+            return 0
+
+        count = 0
+        for station in stations:
+            if os.sep in station or station.startswith('.'):
+                logger.warning("prerender skipped station with unsafe name: %s", station)
+                continue
+
+            _tide_page = get_tide_page(station, time)
+            if _tide_page is None:
+                self.remove(station)
+                continue
+
+            water_photo_name, _tide_dict = _tide_page
+            body = self.template.render(water_photo_name=water_photo_name, tide_dict=_tide_dict).encode()
+
+            digest = hashlib.sha1(body).hexdigest()
+            if self.written.get(station) == digest and os.path.exists(self.page_path(station)):
+                continue
+
+            write_file_atomic(self.page_path(station), body)
+            self.written[station] = digest
+            count += 1
+
+        return count
+
+    def remove(self, station):
+        '''remove a station's page so nginx falls back to FastAPI
+        '''
+        self.written.pop(station, None)
+        try:
+            os.remove(self.page_path(station))
+        except FileNotFoundError:
+            pass
+
+    def take_writer(self):
+        '''True if this process writes the pages, non blocking lock across processes as refresh_lock()
+        the lock is kept until stop() (or the process exits)
+        '''
+        if self._lock_file is not None:
+            return True
+
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(f"{self.directory}.lock", 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info("this worker writes the prerendered pages")
+        return True
+
+    def clear(self):
+        '''remove every page (and temp file), nginx falls back to FastAPI
+        returns the number of files removed
+        '''
+        self.written = {}
+        count = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if entry.name.endswith((".html", ".tmp")):
+                try:
+                    os.remove(entry.path)
+                    count += 1
+                except FileNotFoundError:
+                    pass
+        return count
+
+    def stop(self):
+        '''at shut down, the writer removes its pages and lets another worker take over
+        '''
+        if self._lock_file is None:
+            return
+        self.clear()
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+        self._lock_file = None
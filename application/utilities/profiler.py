@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+'''
+file name:  profiler.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Profile single requests on the server and write a flame graph file.
+
+    A request is profiled when
+        an allowed user asks    header "X-Profile: 1" or ?profile=1
+        it is sampled           one in config.profile_sample_every requests
+    While it runs a thread samples every thread's stack each
+    config.profile_interval seconds.  Sync endpoints (/tide) run on a worker
+    thread, not the event loop, so a per thread profiler like cProfile would
+    miss them.  Idle threads (waiting on a queue, lock or select) are left out.
+
+    The stacks are written to config.profile_directory as collapsed stacks
+    ("thread;outer;inner count" lines), one file per request, the oldest
+    removed past config.profile_keep.  Open them in https://www.speedscope.app
+    or flamegraph.pl.  The file name is sent back in the X-Profile-File header.
+
+special instruction:
+    Nothing is added to the app unless config.profile_enabled, there is no
+    cost when it is off.  One request is profiled at a time, other requests
+    asking while one runs are served without a profile.  Other requests
+    running at the same time show up in the samples under their own thread.
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import collections
+import itertools
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from urllib.parse import parse_qs
+
+
+logger = logging.getLogger(__name__)
+
+# leaf frames that mean the thread is waiting, not working
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("thread.py", "_worker"),           # ThreadPoolExecutor waiting for work
+    ("handlers.py", "dequeue"),         # the log QueueListener
+}
+
+
+def frame_stack(frame):
+    '''function names from the outermost frame to frame
+    '''
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def is_idle(frame):
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in IDLE_FRAMES
+
+
+class StackSampler(threading.Thread):
+    '''samples every other thread's stack each interval until stop()
+    '''
+    def __init__(self, interval=0.005):
+        super().__init__(name="profile_sampler", daemon=True)
+        self.interval = interval
+        self.samples = collections.Counter()    # (thread name, frame...) : count
+        self._stop_event = threading.Event()
+
+    def run(self):
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident or is_idle(frame):
+                    continue
+                name = names.get(ident)
+                if name is None:
+                    thread = threading._active.get(ident)
+                    name = names[ident] = thread.name if thread is not None else str(ident)
+                self.samples[(name, *frame_stack(frame))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.samples
+
+
+def collapsed(samples):
+    '''collapsed stack text, the most sampled stacks first
+    '''
+    return "".join(f"{';'.join(stack)} {count}\n"
+                   for stack, count in samples.most_common())
+
+
+def write_profile(directory, file_name, text, keep=50):
+    '''write one profile, then remove the oldest past keep
+    returns the path written
+    '''
+    os.makedirs(directory, exist_ok=True)
+    file_path_name = os.path.join(directory, file_name)
+    temp_file_path_name = f"{file_path_name}.tmp"
+    with open(temp_file_path_name, "w") as file:
+        file.write(text)
+    os.replace(temp_file_path_name, file_path_name)
+
+    profiles = sorted((entry for entry in os.scandir(directory) if entry.name.endswith(".collapsed")),
+                      key=lambda entry: entry.stat().st_mtime)
+    for entry in profiles[:-keep] if keep else []:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+    return file_path_name
+
+
+class ProfileMiddleware():
+    '''ASGI middleware, profiles requests asked for by an allowed user, and one in sample_every
+    allowed(scope) decides if the request may ask (logged in with an allowed scope)
+    '''
+    def __init__(self, app, directory, allowed, sample_every=0, keep=50, interval=0.005):
+        self.app = app
+        self.directory = directory
+        self.allowed = allowed
+        self.sample_every = sample_every
+        self.keep = keep
+        self.interval = interval
+
+        self._count = itertools.count(1)
+        self._running = threading.Lock()
+
+    def asked(self, scope):
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return value not in (b"", b"0")
+        if b"profile" in scope["query_string"]:
+            return parse_qs(scope["query_string"].decode("latin-1")).get("profile", ["0"])[0] not in ("", "0")
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = (self.sample_every and next(self._count) % self.sample_every == 0) \
+            or (self.asked(scope) and self.allowed(scope))
+        if not profile or not self._running.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        try:
+            await self.profile(scope, receive, send)
+        finally:
+            self._running.release()
+
+    async def profile(self, scope, receive, send):
+        now = time.time()
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_") or "index"
+        file_name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}_{slug}.collapsed"
+
+        async def send_file_name(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-file", file_name.encode())]
+            await send(message)
+
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_file_name)
+        finally:
+            seconds = time.perf_counter() - start
+            samples = sampler.stop()
+            write_profile(self.directory, file_name, collapsed(samples), self.keep)
+            logger.info("profiled %s in %.1f ms, %d samples: %s", scope["path"], seconds * 1000,
+                        sum(samples.values()), file_name)
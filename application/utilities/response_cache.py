@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+'''
+file name:  response_cache.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    In process cache of rendered pages keyed by (key, render bucket).  Holds the
+    page bytes with a strong ETag and Last-Modified and answers If-None-Match
+    with a 304, so phones polling a page cost a dict lookup and a few headers.
+
+special instruction:
+    The bucket is whatever the page changes on (the tide page uses the minute).
+    Only the current bucket is kept for each key, so the cache never holds more
+    than one entry per key.  Cache-Control max-age runs to the end of the bucket.
+    clear() when the data behind the pages changes (a new tide store).
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+from dataclasses import dataclass
+from email.utils import formatdate
+import hashlib
+
+from fastapi import Request, Response
+
+
+@dataclass
+class CachedPage:
+    bucket: int
+    body: bytes
+    etag: str
+    last_modified: str
+    media_type: str
+
+
+class ResponseCache():
+    def __init__(self):
+        self.entries = {}
+        self.generation = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, bucket, generation=None):
+        '''returns the CachedPage for key in this bucket, None if it needs rendering
+        a new generation clears every entry
+        '''
+        if generation != self.generation:
+            self.clear(generation)
+
+        entry = self.entries.get(key)
+        if entry is None or entry.bucket != bucket:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    def put(self, key, bucket, body, last_modified, media_type="text/html"):
+        '''store rendered bytes, last_modified is epoch seconds of the bucket start
+        '''
+        entry = CachedPage(
+            bucket=bucket,
+            body=body,
+            etag=f'"{hashlib.sha1(body).hexdigest()}"',
+            last_modified=formatdate(last_modified, usegmt=True),
+            media_type=media_type,
+            )
+        self.entries[key] = entry
+        return entry
+
+    def fingerprint(self, entry: CachedPage):
+        '''short content hash for versioned URLs
+        '''
+        return entry.etag.strip('"')[:16]
+
+    def clear(self, generation=None):
+        self.entries = {}
+        self.generation = generation
+
+    def response(self, request: Request, entry: CachedPage, max_age: int, immutable=False) -> Response:
+        '''full response, or 304 if the client already has this ETag
+        immutable is for fingerprinted URLs whose content never changes
+        '''
+        if immutable:
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = f"max-age={max(0, int(max_age))}"
+
+        headers = {
+            "ETag": entry.etag,
+            "Last-Modified": entry.last_modified,
+            "Cache-Control": cache_control,
+        }
+
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+
+def etag_matches(if_none_match, etag):
+    '''If-None-Match can be *, or a list of tags that may be weak (W/"...")
+    '''
+    if not if_none_match:
+        return False
+
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
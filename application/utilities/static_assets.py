@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+'''
+file name:  static_assets.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    /static with fingerprinted URLs.  static_url() (a Jinja global) gives the
+    page /static/img-site/beach_iphone.<hash>.png, the file is hashed the
+    first time it is asked for (by static_url() or by a request for a hashed
+    URL another worker handed out), not at import, so a worker starts without
+    reading the image tree.  A hashed URL can never change
+    content so it is sent with Cache-Control immutable and the browser stops
+    revalidating the images on every page load.  Plain /static/... URLs still
+    work but have to revalidate (ETag / Last-Modified, 304).
+
+    If a file has a .br or .gz sibling (tools/precompress_static.py) and the
+    browser accepts it, the sibling is sent with Content-Encoding.
+
+special instruction:
+    Range requests always get the uncompressed file so the byte offsets are
+    the ones the browser expects.
+    Files already named <name>.<10 hex>.<ext> (tools/build_assets.py output)
+    are served as they are, immutable.
+    A file's hash is kept for the life of the worker, restart after changing a file.
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+HASH_LENGTH = 10
+FINGERPRINTED = re.compile(r"\.[0-9a-f]{%d}\.[^./]+$" % HASH_LENGTH)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+
+# sibling extension, Content-Encoding, in order of preference
+ENCODINGS = ((".br", "br"), (".gz", "gzip"))
+
+# text files worth compressing, the images already are
+COMPRESSIBLE = {".css", ".js", ".svg", ".html", ".json", ".txt", ".xml", ".map"}
+
+
+def file_hash(file_path_name):
+    digest = hashlib.sha1()
+    with open(file_path_name, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def fingerprinted_name(path, digest):
+    '''img-site/ocean0.png -> img-site/ocean0.<digest>.png
+    '''
+    stem, extension = os.path.splitext(path)
+    return f"{stem}.{digest}{extension}"
+
+
+def accepted_encodings(accept_encoding):
+    '''content codings from an Accept-Encoding header, without the q=0 ones
+    '''
+    encodings = set()
+    for item in accept_encoding.split(","):
+        coding, _, parameters = item.strip().partition(";")
+        quality = parameters.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            encodings.add(coding.strip().lower())
+    return encodings
+
+
+def precompress(directory):
+    '''write .gz (and .br if brotli is installed) next to each compressible file
+    skipped when the sibling is already newer or would not be smaller, returns the count written
+    '''
+    written = 0
+    for root, _, file_names in os.walk(directory):
+        for file_name in file_names:
+            if os.path.splitext(file_name)[1].lower() not in COMPRESSIBLE:
+                continue
+
+            file_path_name = os.path.join(root, file_name)
+            with open(file_path_name, 'rb') as file:
+                body = file.read()
+
+            compressors = [(".gz", lambda data: gzip.compress(data, 9, mtime=0))]
+            if brotli is not None:
+                compressors.insert(0, (".br", lambda data: brotli.compress(data, quality=11)))
+
+            for extension, compress in compressors:
+                sibling = file_path_name + extension
+                if os.path.exists(sibling) and os.path.getmtime(sibling) >= os.path.getmtime(file_path_name):
+                    continue
+                compressed = compress(body)
+                if len(compressed) >= len(body):
+                    continue
+                with open(sibling + ".tmp", 'wb') as file:
+                    file.write(compressed)
+                os.replace(sibling + ".tmp", sibling)
+                written += 1
+
+    return written
+
+
+class STATIC_ASSETS(StaticFiles):
+    def __init__(self, directory, url_path="/static", **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.url_path = url_path.rstrip("/")
+
+        # path -> fingerprinted path, and back, filled in as files are asked for
+        self.manifest = {}
+        self.fingerprints = {}
+
+    def fingerprint(self, path):
+        '''fingerprinted path for a file under the static directory, hashed the first time
+        None if there is no such file
+        '''
+        hashed_path = self.manifest.get(path)
+        if hashed_path is not None:
+            return hashed_path
+
+        if FINGERPRINTED.search(path):
+            # already named by its hash (tools/build_assets.py output)
+            hashed_path = path
+        else:
+            full_path, stat_result = self.lookup_path(path)
+            if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+                return None
+            hashed_path = fingerprinted_name(path, file_hash(full_path))
+            self.fingerprints[os.path.normpath(hashed_path)] = os.path.normpath(path)
+        self.manifest[path] = hashed_path
+        return hashed_path
+
+    def static_url(self, path):
+        '''URL for a file under the static directory, fingerprinted if the file is there
+        '''
+        path = path.lstrip("/")
+        return f"{self.url_path}/{quote(self.fingerprint(path) or path)}"
+
+    async def get_response(self, path, scope):
+        # a fingerprinted URL is the real file, cached for good
+        real_path = self.fingerprints.get(path)
+        if real_path is None and FINGERPRINTED.search(path):
+            # a URL from a page another worker rendered, hash the file it names to check it
+            stem, extension = os.path.splitext(path)
+            if self.fingerprint(f"{stem[:-HASH_LENGTH - 1]}{extension}".replace(os.sep, "/")) is not None:
+                real_path = self.fingerprints.get(path)
+        scope["static_immutable"] = real_path is not None or bool(FINGERPRINTED.search(path))
+        return await super().get_response(real_path or path, scope)
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        headers = {
+            "Cache-Control": IMMUTABLE if scope.get("static_immutable") else REVALIDATE,
+        }
+
+        response = None
+        encodings = accepted_encodings(request_headers.get("accept-encoding", ""))
+        if encodings and "range" not in request_headers:
+            response = self.encoded_response(full_path, stat_result, encodings, headers, status_code)
+
+        if response is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+            if os.path.splitext(full_path)[1].lower() in COMPRESSIBLE:
+                response.headers["Vary"] = "Accept-Encoding"
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def encoded_response(self, full_path, stat_result, encodings, headers, status_code):
+        '''the .br / .gz sibling if the browser takes it, None to send the file as it is
+        '''
+        for extension, encoding in ENCODINGS:
+            if encoding not in encodings:
+                continue
+            try:
+                sibling_stat = os.stat(f"{full_path}{extension}")
+            except OSError:
+                continue
+            # an old sibling would send the old content
+            if sibling_stat.st_mtime < stat_result.st_mtime:
+                continue
+
+            response = FileResponse(f"{full_path}{extension}", status_code=status_code,
+                                    stat_result=sibling_stat, headers=headers,
+                                    media_type=mimetypes.guess_type(full_path)[0] or "text/plain")
+            response.headers["Content-Encoding"] = encoding
+            response.headers["Vary"] = "Accept-Encoding"
+            return response
+
+        return None
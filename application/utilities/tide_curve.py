@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+'''
+file name:  tide_curve.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Vectorized tide height engine.  Uses the same half sine interpolation as
+    NOAA_TIDES.get_current_tide_height but evaluates an array of times in one
+    call so charts and batch jobs do not loop in Python.
+
+special instruction:
+    times are "wall clock" epoch seconds, the naive local datetime from NOAA
+    (lst_ldt) counted from 1970-01-01 00:00.  Use to_epoch() to convert.
+    Times before the first or after the last hi/lo are held at that height.
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import datetime
+
+import numpy as np
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# determines which portion of sine wave to use (same as NOAA_TIDES)
+SINE_OFFSET = 1.5
+
+
+def to_epoch(time):
+    '''convert a naive datetime (or list/array of them) to wall clock epoch seconds
+    '''
+    if isinstance(time, datetime.datetime):
+        return int((time - EPOCH).total_seconds())
+    return np.asarray(time, dtype='datetime64[s]').astype(np.int64)
+
+
+def from_epoch(seconds):
+    '''convert wall clock epoch seconds back to a naive datetime
+    '''
+    return EPOCH + datetime.timedelta(seconds=int(seconds))
+
+
+class TideCurve():
+    def __init__(self, times, heights):
+        '''times are epoch seconds of each hi/lo, heights are feet
+        '''
+        self.times = np.asarray(times, dtype=np.int64)
+        self.heights = np.asarray(heights, dtype=np.float64)
+
+        if self.times.shape != self.heights.shape:
+            raise ValueError("times and heights must be the same length")
+
+    @classmethod
+    def from_station_dict(cls, tide_dict):
+        '''build from one station's tide dict (tide_N: {type, height, time})
+        '''
+        events = sorted(tide_dict.values(), key=lambda _tide: _tide['time'])
+        times = [to_epoch(_tide['time']) for _tide in events]
+        heights = [float(_tide['height']) for _tide in events]
+        return cls(times, heights)
+
+    def __len__(self):
+        return len(self.times)
+
+    def heights_at(self, times):
+        '''returns tide heights for an array of times (datetimes or epoch seconds)
+        '''
+        if len(self.times) < 2:
+            raise ValueError("tide curve needs at least two hi/lo predictions")
+
+        if isinstance(times, datetime.datetime):
+            times = to_epoch(times)
+        _times = np.asarray(times)
+        if not np.issubdtype(_times.dtype, np.integer):
+            _times = to_epoch(_times)
+
+        # #### Find which two tides each time is between
+        # the end tide is the first tide at or after the time
+        end = np.searchsorted(self.times, _times, side='left')
+        end = np.clip(end, 1, len(self.times) - 1)
+        start = end - 1
+
+        start_times = self.times[start]
+        seconds_span = (self.times[end] - start_times).astype(np.float64)
+        tide_span = self.heights[end] - self.heights[start]
+
+        # position in the tide period, 0 to 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            portion = np.where(seconds_span > 0, (_times - start_times) / seconds_span, 0.0)
+        portion = np.clip(portion, 0.0, 1.0)
+
+        # offset the sine wave up (0 to 2) then divide to get (0 to 1)
+        sine_x = (np.sin(np.pi * (SINE_OFFSET + portion)) + 1.0) / 2
+
+        return (sine_x * tide_span) + self.heights[start]
+
+    def height_at(self, time):
+        '''single height, convenience wrapper for heights_at
+        '''
+        return float(self.heights_at(np.array([to_epoch(time)]))[0])
+
+    def sample(self, start, end, step_seconds=60):
+        '''returns (times, heights) every step_seconds from start up to end
+        '''
+        times = np.arange(to_epoch(start), to_epoch(end), step_seconds, dtype=np.int64)
+        return times, self.heights_at(times)
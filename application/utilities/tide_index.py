@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+'''
+file name:  tide_index.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Sorted time index over one station's hi/lo predictions.  Built once when
+    the tide cache loads and queried with bisect so next/previous tide lookups
+    stay O(log n) however many days are cached.
+
+special instruction:
+    times are wall clock epoch seconds (see tide_curve.to_epoch).
+    Events are returned in the same format as the tide dict:
+        {'type': 'H' or 'L', 'height': float, 'time': datetime}
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import bisect
+import datetime
+
+from application.utilities.tide_curve import TideCurve, to_epoch, from_epoch
+
+
+class TideIndex():
+    def __init__(self, times, heights, types):
+        '''times must be sorted ascending, all three are the same length
+        '''
+        self.times = times
+        self.heights = heights
+        self.types = types
+
+        self._curve = None
+
+    @classmethod
+    def from_station_dict(cls, tide_dict):
+        '''build from one station's tide dict (tide_N: {type, height, time})
+        '''
+        events = sorted(tide_dict.values(), key=lambda _tide: _tide['time'])
+        return cls(
+            [to_epoch(_tide['time']) for _tide in events],
+            [float(_tide['height']) for _tide in events],
+            [_tide['type'] for _tide in events],
+            )
+
+    def __len__(self):
+        return len(self.times)
+
+    def event(self, position):
+        '''returns the event at position in the tide dict format
+        '''
+        _type = self.types[position]
+        if not isinstance(_type, str):
+            # columnar stores keep the type as its ascii code
+            _type = chr(_type)
+
+        return {
+            'type': _type,
+            'height': float(self.heights[position]),
+            'time': from_epoch(self.times[position]),
+        }
+
+    def position(self, time):
+        '''position of the first event at or after time
+        '''
+        if isinstance(time, datetime.datetime):
+            time = to_epoch(time)
+        return bisect.bisect_left(self.times, time)
+
+    def next_event(self, time):
+        '''first tide at or after time, None if past the end of the data
+        '''
+        position = self.position(time)
+        if position >= len(self.times):
+            return None
+        return self.event(position)
+
+    def prev_event(self, time):
+        '''last tide before time, None if before the start of the data
+        '''
+        position = self.position(time)
+        if position == 0:
+            return None
+        return self.event(position - 1)
+
+    def bracket(self, time):
+        '''returns (prev_event, next_event), either may be None at the ends
+        '''
+        position = self.position(time)
+        prev_event = self.event(position - 1) if position > 0 else None
+        next_event = self.event(position) if position < len(self.times) else None
+        return prev_event, next_event
+
+    def curve(self):
+        '''TideCurve over the same events, built on first use
+        '''
+        if self._curve is None:
+            self._curve = TideCurve(self.times, self.heights)
+        return self._curve
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+'''
+file name:  tide_render.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Layout values for tide.html: text positions, text colour and which water
+    image goes over the beach.  Shared by the tide endpoint and the snapshot
+    table so both draw the page the same way.
+
+special instruction:
+    The artwork is 1179 x 2556 and shown 1800 px tall.  The water line is
+    115 px per foot down from the top with 0' at 6 feet (690 px).
+    Functions take floats or numpy arrays.
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import datetime
+import json
+
+import numpy as np
+
+from application.utilities.tide_curve import to_epoch
+
+
+# #### layout constants
+PIXELS_PER_FOOT = 115
+FEET_OFFSET = 6
+CURRENT_TEXT_LIFT = 200         # current tide text sits above the water line
+SCREEN_RATIO = 1800 / 2556      # artwork height to screen height
+
+# water images are oceanN.png from -4 to 14, water15.png at the top
+WATER_PHOTO_MIN = -4
+WATER_PHOTO_MAX = 15
+
+NEXT_TIDE_TEXT_COLOR = {"high": "black", "low": "white"}
+
+
+def next_tide_text_position(next_tide_height):
+    '''top of the next tide text in screen px, uses the whole feet of the height
+    '''
+    position = PIXELS_PER_FOOT * (np.trunc(np.round(next_tide_height, 1)) + FEET_OFFSET)
+    return np.trunc(SCREEN_RATIO * position).astype(int)
+
+
+def current_tide_text_position(current_tide_height):
+    '''top of the current tide text in screen px
+    '''
+    position = PIXELS_PER_FOOT * np.trunc(current_tide_height + FEET_OFFSET) - CURRENT_TEXT_LIFT
+    return np.trunc(SCREEN_RATIO * position).astype(int)
+
+
+def water_photo_index(current_tide_height):
+    '''nearest whole foot water image
+    '''
+    return np.clip(np.round(current_tide_height), WATER_PHOTO_MIN, WATER_PHOTO_MAX).astype(int)
+
+
+def water_photo_name(index):
+    if index >= WATER_PHOTO_MAX:
+        return f"water{WATER_PHOTO_MAX}.png"
+    return f"ocean{index}.png"
+
+
+def next_tide_text(next_tide_dict):
+    '''display string for the next tide, same as NOAA_TIDES.get_next_tide_string
+    '''
+    next_tide = 'High' if next_tide_dict['type'] == 'H' else 'Low'
+    return f"{next_tide_dict['height']:.1f}\' {next_tide} at {next_tide_dict['time'].strftime('%-I:%M %p')}"
+
+
+def create_tide_dict(current_tide_height, next_tide_dict):
+    '''returns (water_photo_name, tide_dict) for tide.html
+
+    current_tide_height:  feet, rounded to 0.1
+    next_tide_dict:  {'type', 'height', 'time'} of the next tide
+    '''
+    _next_tide = "high" if next_tide_dict['type'] == 'H' else "low"
+
+    _tide_dict = {
+        "current tide height": current_tide_height,
+        "current tide text position": int(current_tide_text_position(current_tide_height)),
+        "next tide": _next_tide,
+        "next tide text": f"---- {next_tide_text(next_tide_dict)} -------",
+        "next tide text position": int(next_tide_text_position(next_tide_dict['height'])),
+        "next tide text color": NEXT_TIDE_TEXT_COLOR[_next_tide],
+    }
+
+    return water_photo_name(int(water_photo_index(current_tide_height))), _tide_dict
+
+
+def create_day_payload(station, tide_index, day, water_svg=None):
+    '''JSON bytes for the client side tide page (tide_client.html)
+
+    Holds the tides for day plus the tide either side so the browser can
+    interpolate across midnight, and the layout constants above.
+    water_svg:  {'version', 'min', 'max'} to draw the water with /water/ svgs instead of pngs
+    '''
+    day_start = datetime.datetime.combine(day, datetime.time())
+    day_end = day_start + datetime.timedelta(days=1)
+
+    first = max(tide_index.position(day_start) - 1, 0)
+    last = min(tide_index.position(day_end) + 1, len(tide_index))
+
+    events = []
+    for position in range(first, last):
+        _tide = tide_index.event(position)
+        events.append({
+            "time": to_epoch(_tide['time']),
+            "height": round(_tide['height'], 3),
+            "type": _tide['type'],
+        })
+
+    payload = {
+        "station": station,
+        "day": day.isoformat(),
+        "events": events,
+        "layout": {
+            "pixels_per_foot": PIXELS_PER_FOOT,
+            "feet_offset": FEET_OFFSET,
+            "current_text_lift": CURRENT_TEXT_LIFT,
+            "screen_ratio": SCREEN_RATIO,
+            "water_photo_min": WATER_PHOTO_MIN,
+            "water_photo_max": WATER_PHOTO_MAX,
+            "next_tide_text_color": NEXT_TIDE_TEXT_COLOR,
+        },
+        "water_photos": {index: water_photo_name(index)
+                         for index in range(WATER_PHOTO_MIN, WATER_PHOTO_MAX + 1)},
+        "water_svg": water_svg,
+    }
+
+    return json.dumps(payload, separators=(",", ":")).encode()
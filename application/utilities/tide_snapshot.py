@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+'''
+file name:  tide_snapshot.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Per minute table of everything tide.html needs for each station, built
+    once after the tide cache loads.  Serving a page is then one array index
+    instead of interpolating, formatting and laying out on every request.
+
+special instruction:
+    Built from {station name: TideIndex} (TideStore.stations).  Rows run from
+    the first to the last cached tide, a time outside that returns None and the
+    caller falls back to computing the values directly.
+    About 13 bytes per station per minute, 130 KB per station for 7 days.
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import datetime
+
+import numpy as np
+
+from application.utilities.tide_curve import to_epoch
+import application.utilities.tide_render as tide_render
+
+
+class StationSnapshot():
+    def __init__(self, tide_index):
+        self.tide_index = tide_index
+
+        # #### one row per minute from the first to the last tide
+        times = np.asarray(tide_index.times, dtype=np.int64)
+        self.start = int(times[0]) // 60 * 60
+        minutes = np.arange(self.start, int(times[-1]) + 60, 60, dtype=np.int64)
+
+        current_heights = np.round(tide_index.curve().heights_at(minutes), 1)
+
+        # the next tide is the first at or after the minute
+        next_event = np.searchsorted(times, minutes, side='left')
+        next_event = np.minimum(next_event, len(times) - 1)
+        next_heights = np.asarray(tide_index.heights, dtype=np.float64)
+
+        self.current_heights = current_heights.astype(np.float32)
+        self.next_event = next_event.astype(np.int32)
+        self.current_text_positions = tide_render.current_tide_text_position(current_heights).astype(np.int16)
+        self.next_text_positions = tide_render.next_tide_text_position(next_heights).astype(np.int16)
+        self.water_photo_index = tide_render.water_photo_index(current_heights).astype(np.int8)
+
+        # #### per tide values, a handful per day so plain lists
+        self.next_tide = []
+        self.next_tide_text = []
+        for position in range(len(times)):
+            _tide = tide_index.event(position)
+            self.next_tide.append("high" if _tide['type'] == 'H' else "low")
+            self.next_tide_text.append(f"---- {tide_render.next_tide_text(_tide)} -------")
+
+    def __len__(self):
+        return len(self.current_heights)
+
+    def get(self, time):
+        '''returns (water_photo_name, tide_dict) for the minute containing time, None if outside the table
+        '''
+        row = (to_epoch(time) - self.start) // 60
+        if row < 0 or row >= len(self.current_heights):
+            return None
+
+        event = self.next_event[row]
+        _next_tide = self.next_tide[event]
+
+        _tide_dict = {
+            "current tide height": round(float(self.current_heights[row]), 1),
+            "current tide text position": int(self.current_text_positions[row]),
+            "next tide": _next_tide,
+            "next tide text": self.next_tide_text[event],
+            "next tide text position": int(self.next_text_positions[event]),
+            "next tide text color": tide_render.NEXT_TIDE_TEXT_COLOR[_next_tide],
+        }
+
+        return tide_render.water_photo_name(int(self.water_photo_index[row])), _tide_dict
+
+
+class TideSnapshot():
+    def __init__(self, stations, generation=None):
+        '''stations:  {station name: TideIndex}
+        generation:  TideStore.generation the table was built from
+        '''
+        self.generation = generation
+        self.stations = {station_name: StationSnapshot(tide_index)
+                         for station_name, tide_index in stations.items() if len(tide_index) > 1}
+
+    def get(self, station_name, time=None):
+        '''returns (water_photo_name, tide_dict), None if the station or time is not in the table
+        '''
+        station_snapshot = self.stations.get(station_name)
+        if station_snapshot is None:
+            return None
+
+        if not isinstance(time, datetime.datetime):
+            time = datetime.datetime.now()
+
+        return station_snapshot.get(time)
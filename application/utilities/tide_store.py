@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+'''
+file name:  tide_store.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Columnar on disk tide cache that every uvicorn worker maps read only with
+    mmap.  Station arrays are numpy views straight onto the shared page cache,
+    so more workers do not mean more copies and startup does not unpickle.
+
+special instruction:
+    File layout (little endian):
+        header          magic, version, station count, created (epoch s), duration days
+        station table   per station: name (64 bytes utf-8), first event, event count
+        times           int64 wall clock epoch seconds (see tide_curve.to_epoch)
+        heights         float32 feet
+        types           uint8 ascii 'H' or 'L'
+
+    write_tide_store() writes a temp file then os.replace(), so readers see the
+    old or the new file, never a partial one.  TideStore.maybe_reload() remaps
+    when the file on disk has been replaced.
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+from application.utilities.tide_curve import to_epoch, from_epoch
+from application.utilities.tide_index import TideIndex
+
+
+MAGIC = b'TIDESTOR'
+VERSION = 1
+
+HEADER = struct.Struct('<8sIIqi4x')
+STATION = struct.Struct('<64sQQ')
+NAME_BYTES = 64
+
+
+def write_tide_store(tide_data, file_path_name):
+    '''write a tide data dict (see NOAA_TIDES.create_tide_data_file) as a columnar store
+    '''
+    stations_tides_dict = tide_data.get("stations_tides_dict", {})
+
+    station_rows = []
+    times = []
+    heights = []
+    types = []
+    for station_name, tide_dict in stations_tides_dict.items():
+        name = station_name.encode()
+        if len(name) > NAME_BYTES:
+            raise ValueError(f"station name is longer than {NAME_BYTES} bytes: {station_name}")
+
+        events = sorted(tide_dict.values(), key=lambda _tide: _tide['time'])
+        station_rows.append(STATION.pack(name, len(times), len(events)))
+        times.extend(to_epoch(_tide['time']) for _tide in events)
+        heights.extend(float(_tide['height']) for _tide in events)
+        types.extend(ord(_tide['type']) for _tide in events)
+
+    header = HEADER.pack(MAGIC, VERSION, len(station_rows),
+                         to_epoch(tide_data.get("date")), tide_data.get("duration_days", 0))
+
+    temp_file_path_name = f"{file_path_name}.{os.getpid()}.tmp"
+    with open(temp_file_path_name, 'wb') as file:
+        file.write(header)
+        file.write(b''.join(station_rows))
+        file.write(np.asarray(times, dtype='<i8').tobytes())
+        file.write(np.asarray(heights, dtype='<f4').tobytes())
+        file.write(np.asarray(types, dtype='u1').tobytes())
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temp_file_path_name, file_path_name)
+
+
+class TideStore():
+    def __init__(self, file_path_name, reload_interval=1.0):
+        '''reload_interval:  seconds between checks for a replaced file in maybe_reload
+        '''
+        self.file_path_name = file_path_name
+        self.reload_interval = reload_interval
+
+        # bumped every time a new file is mapped, lets other caches know to clear
+        self.generation = 0
+
+        self.date = None
+        self.duration_days = None
+        self.stations = {}
+
+        self._file_id = None
+        self._mmap = None
+        self._next_check = 0.0
+
+        self.reload()
+
+    def __contains__(self, station_name):
+        return station_name in self.stations
+
+    def get(self, station_name, default=None):
+        '''returns the TideIndex for a station
+        '''
+        return self.stations.get(station_name, default)
+
+    @property
+    def loaded(self):
+        return self._mmap is not None
+
+    def reload(self):
+        '''map the file on disk, returns False if there is no file
+        '''
+        try:
+            with open(self.file_path_name, 'rb') as file:
+                stat = os.fstat(file.fileno())
+                _mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError is an empty file
+            return False
+
+        magic, version, station_count, created, duration_days = HEADER.unpack_from(_mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a version {VERSION} tide store: {self.file_path_name}")
+
+        table_offset = HEADER.size
+        station_table = [STATION.unpack_from(_mmap, table_offset + count * STATION.size)
+                         for count in range(station_count)]
+        event_count = sum(row[2] for row in station_table)
+
+        times_offset = table_offset + station_count * STATION.size
+        heights_offset = times_offset + 8 * event_count
+        types_offset = heights_offset + 4 * event_count
+
+        times = np.frombuffer(_mmap, dtype='<i8', count=event_count, offset=times_offset)
+        heights = np.frombuffer(_mmap, dtype='<f4', count=event_count, offset=heights_offset)
+        types = np.frombuffer(_mmap, dtype='u1', count=event_count, offset=types_offset)
+
+        stations = {}
+        for name, first, count in station_table:
+            _slice = slice(first, first + count)
+            stations[name.rstrip(b'\0').decode()] = TideIndex(times[_slice], heights[_slice], types[_slice])
+
+        # #### swap in the new mapping
+        # the old mapping is left for the garbage collector, requests in flight may still hold its views
+        self.stations = stations
+        self.date = from_epoch(created)
+        self.duration_days = duration_days
+        self._mmap = _mmap
+        self._file_id = (stat.st_ino, stat.st_mtime_ns)
+        self.generation += 1
+
+        return True
+
+    def maybe_reload(self):
+        '''remap if the file was replaced, checks at most once per reload_interval
+        returns True if a new file was mapped
+        '''
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+
+        try:
+            stat = os.stat(self.file_path_name)
+        except FileNotFoundError:
+            return False
+
+        if (stat.st_ino, stat.st_mtime_ns) == self._file_id:
+            return False
+        return self.reload()
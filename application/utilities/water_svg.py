@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+'''
+file name:  water_svg.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Draws the water layer for tide.html as a small SVG for any height, so the
+    water moves in 0.1 foot steps instead of jumping a foot at a time between
+    the oceanN.png files (and is about 1 KB instead of 0.4 - 2.5 MB).
+
+special instruction:
+    Same canvas and scale as the png layers: 1179 x 2556, water from the top
+    down to 115 px per foot with 0' at 6 feet.  Heights are clamped to
+    WATER_SVG_MIN..WATER_SVG_MAX and bucketed to 0.1 ft, each bucket is built
+    once and kept (about 220 of them).
+'''
+__revision__ = 'v0.0.1'
+__status__ = 'DEV' # 'DEV', 'alpha', 'beta', 'production'
+
+import functools
+import math
+
+import application.utilities.tide_render as tide_render
+
+
+# bump when the drawing changes, it is part of the (immutable) URL
+WATER_SVG_VERSION = 1
+
+WATER_SVG_MIN = -6.0
+WATER_SVG_MAX = 16.0
+
+WIDTH = 1179
+HEIGHT = 2556
+
+# the water line waves, px
+WAVE_COUNT = 6
+WAVE_HEIGHT = 14
+
+
+def water_bucket(height):
+    '''clamp and round a height to the 0.1 ft the svg is drawn at
+    raises ValueError for nan and inf, min/max do not clamp nan
+    '''
+    height = float(height)
+    if not math.isfinite(height):
+        raise ValueError(f"water height is not finite: {height}")
+    return round(min(max(height, WATER_SVG_MIN), WATER_SVG_MAX), 1)
+
+
+def water_svg_url(height):
+    return f"/water/v{WATER_SVG_VERSION}/{water_bucket(height):.1f}.svg"
+
+
+@functools.lru_cache(maxsize=None)
+def _create_water_svg(bucket):
+    water_line = tide_render.PIXELS_PER_FOOT * (bucket + tide_render.FEET_OFFSET)
+
+    # #### wavy edge, right to left so the path closes back at the top left
+    # the crests swap sides each 0.1 ft so the edge looks like it is moving
+    wave_length = WIDTH / WAVE_COUNT
+    flip = 1 if round(bucket * 10) % 2 else -1
+    edge = f"M{WIDTH},{water_line:.0f}"
+    for count in range(WAVE_COUNT):
+        x = WIDTH - count * wave_length
+        crest = water_line + flip * WAVE_HEIGHT * (1 if count % 2 else -1)
+        edge += f" Q{x - wave_length / 2:.0f},{crest:.0f} {x - wave_length:.0f},{water_line:.0f}"
+
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {WIDTH} {HEIGHT}" preserveAspectRatio="none">'
+        '<defs><linearGradient id="w" x1="0" y1="0" x2="0" y2="1">'
+        '<stop offset="0" stop-color="#050f2e"/><stop offset="1" stop-color="#0c1b46"/>'
+        '</linearGradient></defs>'
+        f'<path d="M0,0 H{WIDTH} L{edge[1:]} Z" fill="url(#w)"/>'
+        f'<path d="{edge}" fill="none" stroke="#dfe8f0" stroke-opacity="0.55" stroke-width="6"/>'
+        '</svg>'
+        )
+    return svg.encode()
+
+
+def create_water_svg(height):
+    '''svg bytes for the water layer at height (feet)
+    '''
+    return _create_water_svg(water_bucket(height))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+'''
+file name:  bench_decode_token.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Cost of Crypto.decode_enhanced_token (run on every authenticated request)
+    reading key.key and building a Fernet per call, as it used to, against
+    the Fernet objects kept by the key manager.
+
+special instruction:
+    run from the repo root, uses a temporary key file:
+        python -m benchmarks.bench_decode_token
+'''
+
+import contextlib
+import io
+import os
+import tempfile
+import timeit
+
+from cryptography.fernet import Fernet
+
+from application.admin.crypto import Crypto
+from application.admin.key_manager import write_keys
+
+
+class FILE_KEY_CRYPTO(Crypto):
+    '''the old get_key / encrypt / decrypt, key file read on every call
+    '''
+    def get_key(self):
+        with open(self.keys.file_path_name, "rb") as file:
+            return file.read().splitlines()[0]
+
+    def decrypt(self, token, key=None):
+        if key is None: key = self.get_key()
+        return Fernet(key).decrypt(token).decode()
+
+
+if __name__ == "__main__":
+    number = 5000
+
+    with tempfile.TemporaryDirectory() as directory:
+        key_file_path_name = os.path.join(directory, "key.key")
+        write_keys([Fernet.generate_key(), Fernet.generate_key()], key_file_path_name)
+
+        crypto = Crypto(key_file_path_name)
+        file_key_crypto = FILE_KEY_CRYPTO(key_file_path_name)
+        log_users = {"user@example.com": {}}
+        token = crypto.enhance_token("user@example.com", crypto.generate_token())
+
+        # decode_enhanced_token prints the token, keep it out of the timing
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert file_key_crypto.decode_enhanced_token(log_users, token) == crypto.decode_enhanced_token(log_users, token)
+
+            before = min(timeit.repeat(lambda: file_key_crypto.decode_enhanced_token(log_users, token), number=number, repeat=5))
+            after = min(timeit.repeat(lambda: crypto.decode_enhanced_token(log_users, token), number=number, repeat=5))
+
+    print(f"\nkey file + new Fernet per call:  {1e6 * before / number:.1f} us")
+    print(f"key manager:                     {1e6 * after / number:.1f} us")
+    print(f"speed up:                        {before / after:.1f}x")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+'''
+file name:  bench_logging.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Per request cost of the old print() debugging (an authenticated page and
+    a tide page, written to a pipe like journald) against the module loggers
+    through log_setup's queue at INFO, where the debug lines are dropped, and
+    at DEBUG, where they are formatted and queued.
+
+special instruction:
+    run from the repo root:
+        python -m benchmarks.bench_logging
+'''
+
+import contextlib
+import datetime
+import logging
+import os
+import threading
+import timeit
+
+from application.utilities.log_setup import setup_logging, stop_logging
+
+
+USER_INFO = {"username": "BradAllen", "full_name": "Brad Allen", "email": "brad@example.com",
+             "hashed_password": "$2b$12$" + "x" * 53, "scope": "user", "disabled": "FALSE"}
+USER_LOG = {"token": "t" * 32, "last_use": datetime.datetime.now(), "persist_data": None}
+TIDE_DICT = {"current tide height": 4.2, "current tide text position": 450, "next tide": "high",
+             "next tide text": "---- 11.3' High at 4:12 PM -------", "next tide text position": 1228,
+             "next tide text color": "black"}
+
+logger = logging.getLogger("application.bench")
+
+
+def print_request():
+    '''what main.py, auth.py and crypto.py printed for one authenticated page and one tide page
+    '''
+    print("\n>>> index GET start<<<<\n")
+    print("\n>>> authenticate <<<")
+    print("\n>>> decode_enhanced_token <<<")
+    print(f"\ndecrypted_token = BradAllen:{USER_LOG['token']}")
+    print(USER_INFO["username"])
+    print(USER_INFO)
+    print(USER_LOG["token"])
+    print(USER_LOG)
+    print("\n>>> index GET end<<<<\n")
+    print("\n>>> endpoint: tide<<<<\n")
+    print(f"water_photo_name: ocean4.png")
+    for key, data in TIDE_DICT.items():
+        print(f"{key}: {data}")
+
+
+def log_request():
+    '''the same two pages with the module loggers
+    '''
+    logger.debug("index GET")
+    logger.debug("tide %s", "Arletta")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("tide %s: %s %s", "Arletta", "ocean4.png", TIDE_DICT)
+
+
+@contextlib.contextmanager
+def journal_pipe():
+    '''a pipe drained by a thread, stands in for systemd's stdout capture
+    yields the write end as a text file
+    '''
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        while os.read(read_fd, 65536):
+            pass
+
+    drainer = threading.Thread(target=drain, daemon=True)
+    drainer.start()
+    with os.fdopen(write_fd, 'w', buffering=1) as pipe:
+        yield pipe
+    drainer.join()
+    os.close(read_fd)
+
+
+if __name__ == "__main__":
+    number = 20000
+
+    with journal_pipe() as pipe:
+        with contextlib.redirect_stdout(pipe):
+            printed = min(timeit.repeat(print_request, number=number, repeat=5))
+
+        setup_logging("INFO", stream=pipe)
+        info = min(timeit.repeat(log_request, number=number, repeat=5))
+
+        logging.getLogger("application").setLevel("DEBUG")
+        debug = min(timeit.repeat(log_request, number=number, repeat=5))
+        stop_logging()
+
+    print(f"\nprint() per request:          {1e6 * printed / number:.1f} us")
+    print(f"logging at INFO per request:  {1e6 * info / number:.2f} us")
+    print(f"logging at DEBUG per request: {1e6 * debug / number:.1f} us (queued, written by the listener thread)")
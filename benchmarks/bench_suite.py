@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+'''
+file name:  bench_suite.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Benchmarks for the tide math, auth and the full request path, on
+    synthetic tide caches (tools/noaa_stub.py predictions), no network.
+
+        tide math       get_current_tide_height, get_next_tide_string and
+                        parse_tide_prediction at 7 day to 1 year horizons
+        cache lookup    parse_station_tide_data at 4, 100 and 1000 stations
+        auth            authenticate with a real Fernet cookie
+        requests        /tide/{station} (cached and rendered) at 4, 100 and
+                        1000 stations and /login, through TestClient
+
+    Results (microseconds per call, best and median of the repeats) are
+    written as JSON and compared with a stored baseline, any benchmark more
+    than --threshold slower than the baseline is reported and the exit
+    status is 1.
+
+special instruction:
+    run from the repo root, everything is written to a temporary directory:
+        python -m benchmarks.bench_suite                        # compare with benchmarks/baseline.json
+        python -m benchmarks.bench_suite --save-baseline        # after a change that is meant to move the numbers
+        python -m benchmarks.bench_suite --only tide. --output results.json
+
+    A baseline only means something on the machine it was made on, make it
+    on the Pi (or the deploy box) and keep it there.
+'''
+
+import argparse
+import csv
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import config
+
+
+STATION_COUNTS = (4, 100, 1000)
+HORIZON_DAYS = (7, 30, 365)
+
+BASELINE_FILE = "benchmarks/baseline.json"
+DEFAULT_THRESHOLD = 0.20        # 20% slower than the baseline is a regression
+
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench password"
+
+
+def measure(function, repeat=5):
+    '''microseconds per call, timeit.autorange picks the number of calls per repeat (at least 0.2 s)
+    '''
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    times = [seconds / number for seconds in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "us": round(1e6 * min(times), 3),
+        "median_us": round(1e6 * statistics.median(times), 3),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def create_predictions(days, station_ID=9446000):
+    '''NOAA predictions JSON for one station from yesterday for days
+    '''
+    from tools.noaa_stub import create_predictions as stub_predictions
+
+    begin_date = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%Y%m%d")
+    return {"predictions": stub_predictions(station_ID, begin_date, 24 * days)}
+
+
+def create_tides_data(tides, station_count, days):
+    '''a tides_cache.pkl dict with station_count stations
+    the stations share one parsed tide dict, lookups do not care and 1000 stations stay cheap to build
+    '''
+    tide_dict = tides.parse_tide_prediction(create_predictions(days))
+    return tides.create_tide_data_file({f"station {count}": tide_dict for count in range(station_count)})
+
+
+def configure(directory):
+    '''point config at a temporary db_disk before anything in application is imported
+    '''
+    from cryptography.fernet import Fernet
+
+    config.log_level = "WARNING"
+    config.prerender_enabled = False
+    config.profile_enabled = False
+    config.session_mode = "server"
+
+    config.user_db_file_path_name = os.path.join(directory, "db_users.csv")
+    config.log_users_file_path_name = os.path.join(directory, "log_users.pkl")
+    config.session_denylist_file_path_name = os.path.join(directory, "session_denylist.json")
+    config.fernet_key_file_path_name = os.path.join(directory, "key.key")
+    config.tides_cache_filepathname = os.path.join(directory, "tides_cache.pkl")
+    config.tides_store_filepathname = os.path.join(directory, "tides_cache.tides")
+    config.prerender_directory = os.path.join(directory, "prerender")
+
+    # the fixture stations are never the configured ones, so the store always looks stale
+    # no background refresh during the timings, and nothing listens on port 9 if one runs anyway
+    config.stale_refresh_minutes = 0
+    config.NOAA_api_url = "http://127.0.0.1:9/api/datagetter"
+    config.NOAA_fetch_retries = 0
+
+    # /login is timed back to back, keep the rate limits out of the way
+    config.login_ip_per_minute = config.login_user_per_minute = 1e6
+    config.login_ip_burst = config.login_user_burst = 1e6
+
+    with open(config.fernet_key_file_path_name, "wb") as file:
+        file.write(Fernet.generate_key() + b"\n")
+
+
+def write_users(hashed_password):
+    from application.admin.user_store import USERS_DB_FIELDS
+
+    with open(config.user_db_file_path_name, "w", newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=USERS_DB_FIELDS)
+        writer.writeheader()
+        writer.writerow({"username": BENCH_USER, "full_name": "Bench User", "email": "bench@example.com",
+                         "hashed_password": hashed_password, "scope": "user", "disabled": "FALSE"})
+
+
+def bench_tide_math(results, repeat, selected):
+    from application.utilities.NOAA_tides import NOAA_TIDES
+    from application.utilities.tide_index import TideIndex
+
+    tides = NOAA_TIDES(db=None)
+    # noon today, inside every horizon
+    time = datetime.datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    for days in HORIZON_DAYS:
+        predictions = create_predictions(days)["predictions"]
+        tide_index = TideIndex.from_station_dict(tides.parse_tide_prediction({"predictions": [dict(p) for p in predictions]}))
+
+        cases = {
+            f"tide.get_current_tide_height.{days}d": lambda: tides.get_current_tide_height(tide_index, time),
+            f"tide.get_next_tide_string.{days}d": lambda: tides.get_next_tide_string(tide_index, time),
+            # parse_tide_prediction changes the predictions in place, each call gets a copy (included in the time)
+            f"tide.parse_tide_prediction.{days}d": lambda: tides.parse_tide_prediction(
+                {"predictions": [dict(p) for p in predictions]}),
+        }
+        run(results, cases, repeat, selected)
+
+    for station_count in STATION_COUNTS:
+        tides_data = create_tides_data(tides, station_count, 7)
+        station_name = f"station {station_count - 1}"
+        run(results, {
+            f"tide.parse_station_tide_data.{station_count}st": lambda: tides.parse_station_tide_data(tides_data, station_name),
+        }, repeat, selected)
+
+
+def bench_app(results, repeat, selected):
+    '''auth and the request path through the real app, main.py is imported here after configure()
+    '''
+    from fastapi.testclient import TestClient
+
+    from application.admin.crypto import pwd_context
+    from application.utilities.NOAA_tides import NOAA_TIDES
+    from application.utilities.tide_store import write_tide_store
+
+    write_users(pwd_context.hash(BENCH_PASSWORD))
+    tides = NOAA_TIDES(db=None)
+    write_tide_store(create_tides_data(tides, STATION_COUNTS[0], 7), config.tides_store_filepathname)
+
+    import application.main as main
+
+    with TestClient(main.app) as client:
+        cookie = main.authorize.log_user(BENCH_USER)
+        run(results, {"auth.authenticate": lambda: main.authorize.authenticate(cookie)}, repeat, selected)
+
+        for station_count in STATION_COUNTS:
+            if not any(f"request.tide.{_kind}.{station_count}st".startswith(selected) for _kind in ("cached", "render")):
+                continue
+            write_tide_store(create_tides_data(tides, station_count, 7), config.tides_store_filepathname)
+            main.app.tide_store.reload()
+            main.load_tide_snapshot()
+
+            url = f"/tide/station {station_count - 1}"
+            response = client.get(url)
+            # a missing station is a 200 too, make sure the fixture store is what is served
+            assert response.status_code == 200 and "not in the data base" not in response.text
+
+            def render():
+                main.response_cache.clear()
+                return client.get(url)
+
+            run(results, {
+                f"request.tide.cached.{station_count}st": lambda: client.get(url),
+                f"request.tide.render.{station_count}st": render,
+            }, repeat, selected)
+
+        login_form = {"username": BENCH_USER, "password": BENCH_PASSWORD}
+        assert client.post("/login", data=login_form, follow_redirects=False).status_code == 302
+        run(results, {
+            "request.login": lambda: client.post("/login", data=login_form, follow_redirects=False),
+        }, repeat, selected)
+
+
+def run(results, cases, repeat, selected):
+    for name, function in cases.items():
+        if not name.startswith(selected):
+            continue
+        results[name] = measure(function, repeat)
+        print(f"{name:45s} {results[name]['us']:12.2f} us", flush=True)
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "node": platform.node(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold):
+    '''print each benchmark against the baseline, returns the names more than threshold slower
+    '''
+    regressions = []
+    baseline_results = baseline.get("results", {})
+    print(f"\n{'benchmark':45s} {'us':>12s} {'baseline':>12s} {'change':>8s}")
+    for name, result in results.items():
+        base = baseline_results.get(name)
+        if base is None:
+            print(f"{name:45s} {result['us']:12.2f} {'-':>12s} {'new':>8s}")
+            continue
+        change = result["us"] / base["us"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:45s} {result['us']:12.2f} {base['us']:12.2f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tides benchmark suite")
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help=f"baseline JSON (default {BASELINE_FILE})")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"fraction slower than the baseline that fails (default {DEFAULT_THRESHOLD})")
+    parser.add_argument("--repeat", type=int, default=5, help="repeats per benchmark, the best is kept")
+    parser.add_argument("--only", default="", help="run only benchmarks starting with this, e.g. tide. or request.")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        configure(directory)
+        bench_tide_math(results, args.repeat, args.only)
+        if any(name.startswith(args.only) or args.only.startswith(name) for name in ("auth.", "request.")):
+            bench_app(results, args.repeat, args.only)
+
+    report = {"environment": environment(), "results": results}
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nbaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nno baseline at {args.baseline}, run with --save-baseline to make one")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) more than {args.threshold:.0%} slower than {args.baseline}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+'''
+file name:  bench_tide_snapshot.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Compares the per request cost of the tide page values computed directly
+    (interpolate, format, lay out) with a lookup in the per minute snapshot.
+
+special instruction:
+    run from the repo root, no network or db_disk needed:
+        python -m benchmarks.bench_tide_snapshot
+'''
+
+import datetime
+import timeit
+
+from application.utilities.NOAA_tides import NOAA_TIDES
+from application.utilities.tide_index import TideIndex
+from application.utilities.tide_snapshot import TideSnapshot
+import application.utilities.tide_render as tide_render
+from tools.noaa_stub import create_predictions
+
+
+def create_station_indexes(days=7, station_count=4):
+    '''synthetic stations in the same format as the tide cache
+    '''
+    tides = NOAA_TIDES(db=None)
+    begin_date = (datetime.datetime.now() - datetime.timedelta(days=1)).strftime("%Y%m%d")
+
+    stations = {}
+    for count in range(station_count):
+        predictions = {"predictions": create_predictions(9446000 + count, begin_date, 24 * days)}
+        stations[f"station {count}"] = TideIndex.from_station_dict(tides.parse_tide_prediction(predictions))
+    return tides, stations
+
+
+def direct_tide_page(tides, tide_index, time):
+    '''what the tide endpoint did on every request before the snapshot table
+    '''
+    _current_tide_height = round(tides.get_current_tide_height(tide_index, time), 1)
+    _next_tide_dict = tide_index.next_event(time) or tide_index.event(-1)
+    return tide_render.create_tide_dict(_current_tide_height, _next_tide_dict)
+
+
+if __name__ == "__main__":
+    number = 20000
+    time = datetime.datetime.now()
+
+    tides, stations = create_station_indexes()
+    station_name, tide_index = next(iter(stations.items()))
+
+    start = timeit.default_timer()
+    snapshot = TideSnapshot(stations)
+    build_seconds = timeit.default_timer() - start
+
+    assert snapshot.get(station_name, time) == direct_tide_page(tides, tide_index, time)
+
+    direct = min(timeit.repeat(lambda: direct_tide_page(tides, tide_index, time), number=number, repeat=5))
+    lookup = min(timeit.repeat(lambda: snapshot.get(station_name, time), number=number, repeat=5))
+
+    print(f"\nsnapshot build, {len(stations)} stations x 7 days:  {1000 * build_seconds:.1f} ms")
+    print(f"direct per request:    {1e6 * direct / number:.1f} us")
+    print(f"snapshot per request:  {1e6 * lookup / number:.1f} us")
+    print(f"speed up:              {direct / lookup:.1f}x")
@@ -28,14 +28,51 @@ rev = 'Tides rev 0.1'
 # ### Server Configurations ### #
 server = 'AditTools'
 
+# "DEBUG" logs the per request detail, see application/utilities/log_setup.py
+log_level = "INFO"
+
+# per request profiles (see application/utilities/profiler.py), off adds nothing to a request
+profile_enabled = False
+profile_scopes = ["admin"]      # users with these scopes may ask with "X-Profile: 1" or ?profile=1
+profile_sample_every = 0        # also profile one in N requests, 0 for none
+profile_directory = "./db_disk/profiles"
+profile_keep = 50               # newest profiles kept
+profile_interval = 0.005        # seconds between stack samples, the GIL switch interval is 0.005
+
 # cookie and auth set up
 cookie_HTTP_only = False    # set to True on server
 auth_cookie_name = 'tides'
 cookie_expire = 15 # minutes
+session_capacity = 10000        # logged users kept, the longest idle is dropped past this
+session_flush_seconds = 30      # log_users.pkl is written at most this often
+
+# password hashing, bcrypt_rounds is written by tools/calibrate_bcrypt.py
+bcrypt_rounds = 12
+bcrypt_target_seconds = 0.25    # calibration picks the most rounds that hash within this
+
+# /login admission control (see application/admin/login_gate.py)
+login_hash_workers = 1          # threads that run bcrypt, leave the other cores for the tide pages
+login_queue_limit = 8           # logins waiting for a hash thread before 429
+login_ip_per_minute = 10        # token bucket per client IP
+login_ip_burst = 5
+login_user_per_minute = 5       # token bucket per username
+login_user_burst = 5
+login_trusted_proxies = ["127.0.0.1", "::1"]   # nginx, the rate limits use its X-Forwarded-For address
+
+# Fernet keys for the auth cookie, newest first (see application/admin/key_manager.py)
+fernet_key_file_path_name = "./key.key"
+fernet_key_reload_interval = 1.0    # seconds between checks for a rotated key file
+
+# "server" keeps sessions in log_users (one worker), "signed" keeps them in the cookie (any number of workers)
+session_mode = "server"
+session_reissue_seconds = 60        # signed: slide the expiry (new cookie) at most this often
+session_max_age_hours = 12          # signed: log in again after this, however active
+session_denylist_file_path_name = "./db_disk/session_denylist.json"   # signed: logged out sessions
 
 
 # #### file paths
 user_db_file_path_name = "./db_disk/db_users.csv"
+user_db_reload_interval = 1.0   # seconds between checks for an edited db_users.csv
 log_users_file_path_name = "./db_disk/log_users.pkl"
 
 
@@ -44,8 +81,27 @@ log_users_file_path_name = "./db_disk/log_users.pkl"
 # ######################
 
 tides_cache_filepathname = "./db_disk/tides_cache.pkl"
+tides_store_filepathname = "./db_disk/tides_cache.tides"   # mmap columnar copy served to workers
+
+# built by tools/build_assets.py
+asset_manifest_filepathname = "./application/static/img-build/manifest.json"
+
+# "png" uses the oceanN.png water images, "svg" draws the water at the current height
+water_layer = "png"
+
+# "server" renders tide.html per request, "client" sends the day's tides and the browser draws the page
+tide_render_mode = "server"
+
+# static tide pages written every minute for nginx (see application/utilities/prerender.py)
+prerender_enabled = False
+prerender_directory = "./db_disk/prerender"
 
 NOAA_data_cache_days = 7
+NOAA_data_retention_days = 1    # days before today kept in the cache
+NOAA_refresh_incremental = True # only request days past the cached data
+NOAA_refresh_schedule = {"hour": 1, "minute": 0}   # cron, hourly is {"minute": 5}
+stale_refresh_minutes = 15      # a cache short of the refresh horizon is refreshed in the background this often (boot, failed refresh), 0 for never
+startup_warn_seconds = 2.0      # log a warning if the app takes longer than this to be ready to serve
 NOAA_tide_stations = {
     "Arletta": 9446491,
     "Gig Harbor": 9446369,
@@ -54,4 +110,9 @@ NOAA_tide_stations = {
 
 }
 
-
+# NOAA CO-OPS requests
+NOAA_api_url = "https://tidesandcurrents.noaa.gov/api/datagetter"
+NOAA_fetch_concurrency = 4      # stations fetched at the same time
+NOAA_fetch_timeout = 10         # seconds per request
+NOAA_fetch_retries = 3
+NOAA_fetch_backoff = 0.5        # seconds, doubles each retry
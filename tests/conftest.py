@@ -0,0 +1,144 @@
+# conftest.py
+
+'''
+cs50 Tides
+
+AditNW LLC
+Brad Allen
+
+pytest fixtures, run from the repo root:
+    python -m pytest -q
+
+noaa_stub   starts tools/noaa_stub.py on a free port, returns its datagetter url
+main        application.main imported against a temporary db_disk (user Tester,
+            password "pw", tides up to date), started with TestClient
+client      the TestClient for main
+
+rev 0.1     create
+'''
+
+import csv
+import datetime
+import os
+import pickle
+import sys
+import threading
+
+from cryptography.fernet import Fernet
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from tools.noaa_stub import create_server, create_predictions
+
+
+TEST_USER = "Tester"
+TEST_PASSWORD = "pw"
+
+
+@pytest.fixture
+def noaa_stub():
+    '''call with failure_rate (and latency), returns the datagetter url
+    '''
+    servers = []
+
+    def start(failure_rate=0.0, latency=0.0):
+        server = create_server(port=0, latency=latency, failure_rate=failure_rate)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}/api/datagetter"
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def create_tides_data(tides, stations_dict, begin, days, date=None):
+    '''tides_cache.pkl dict for stations_dict from begin (a datetime) for days
+    '''
+    stations_tides_dict = {
+        station: tides.parse_tide_prediction(
+            {"predictions": create_predictions(station_ID, begin.strftime("%Y%m%d"), 24 * days)})
+        for station, station_ID in stations_dict.items()
+    }
+    return tides.create_tide_data_file(stations_tides_dict, date=date)
+
+
+@pytest.fixture
+def today():
+    return datetime.datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def write_tides(tides_data):
+    '''write the tides cache pickle and store the app serves from
+    '''
+    from application.utilities.tide_store import write_tide_store
+
+    with open(config.tides_cache_filepathname, "wb") as file:
+        pickle.dump(tides_data, file)
+    write_tide_store(tides_data, config.tides_store_filepathname)
+
+
+def configure(directory):
+    '''point config at directory before application.main is imported
+    '''
+    config.log_level = "WARNING"
+    config.prerender_enabled = False
+    config.profile_enabled = False
+    config.session_mode = "server"
+    config.bcrypt_rounds = 4            # the lowest bcrypt allows, the tests are not about its cost
+
+    config.user_db_file_path_name = os.path.join(directory, "db_users.csv")
+    config.log_users_file_path_name = os.path.join(directory, "log_users.pkl")
+    config.session_denylist_file_path_name = os.path.join(directory, "session_denylist.json")
+    config.fernet_key_file_path_name = os.path.join(directory, "key.key")
+    config.tides_cache_filepathname = os.path.join(directory, "tides_cache.pkl")
+    config.tides_store_filepathname = os.path.join(directory, "tides_cache.tides")
+    config.prerender_directory = os.path.join(directory, "prerender")
+
+    # nothing listens here, a refresh the tests did not ask for fails at once
+    config.NOAA_api_url = "http://127.0.0.1:9/api/datagetter"
+    config.NOAA_fetch_retries = 0
+    config.NOAA_fetch_timeout = 2
+
+    with open(config.fernet_key_file_path_name, "wb") as file:
+        file.write(Fernet.generate_key() + b"\n")
+
+
+@pytest.fixture(scope="session")
+def main_and_client(tmp_path_factory):
+    from fastapi.testclient import TestClient
+
+    configure(str(tmp_path_factory.mktemp("db_disk")))
+
+    from application.admin.crypto import pwd_context
+    from application.admin.user_store import USERS_DB_FIELDS
+    from application.utilities.NOAA_tides import NOAA_TIDES
+
+    with open(config.user_db_file_path_name, "w", newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=USERS_DB_FIELDS)
+        writer.writeheader()
+        writer.writerow({"username": TEST_USER, "full_name": "Test User", "email": "t@example.com",
+                         "hashed_password": pwd_context.hash(TEST_PASSWORD), "scope": "user", "disabled": "FALSE"})
+
+    # up to date tides, the startup refresh has nothing to do
+    tides = NOAA_TIDES(db=None)
+    yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+    write_tides(create_tides_data(tides, tides.stations_dict, yesterday, tides.cache_days))
+
+    import application.main as main
+
+    with TestClient(main.app) as client:
+        yield main, client
+
+
+@pytest.fixture
+def main(main_and_client):
+    return main_and_client[0]
+
+
+@pytest.fixture
+def client(main_and_client):
+    return main_and_client[1]
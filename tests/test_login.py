@@ -0,0 +1,15 @@
+from conftest import TEST_PASSWORD, TEST_USER
+
+
+def test_unknown_user_is_hashed(main, client):
+    '''an unknown username costs a bcrypt verify like a wrong password, the timing does not tell them apart
+    '''
+    verified = main.login_gate.counts["verified"]
+    response = client.post("/login", data={"username": "nobody", "password": TEST_PASSWORD}, follow_redirects=False)
+    assert response.status_code == 200
+    assert "did not match" in response.text
+    assert main.login_gate.counts["verified"] == verified + 1
+
+    response = client.post("/login", data={"username": TEST_USER, "password": "wrong"}, follow_redirects=False)
+    assert "did not match" in response.text
+    assert main.login_gate.counts["verified"] == verified + 2
@@ -0,0 +1,46 @@
+import threading
+import time
+
+from starlette.requests import Request
+
+from application.admin.login_gate import LoginGate, client_ip
+
+
+TRUSTED = ("127.0.0.1", "::1")
+
+
+def request_from(host, forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded is not None else []
+    return Request({"type": "http", "client": (host, 50000), "headers": headers})
+
+
+def test_client_ip_behind_proxy():
+    assert client_ip(request_from("127.0.0.1", "203.0.113.7"), TRUSTED) == "203.0.113.7"
+    # only the address nginx added counts, the client can send any X-Forwarded-For
+    assert client_ip(request_from("127.0.0.1", "10.0.0.1, 203.0.113.7"), TRUSTED) == "203.0.113.7"
+    assert client_ip(request_from("127.0.0.1"), TRUSTED) == "127.0.0.1"
+
+
+def test_client_ip_not_from_proxy():
+    assert client_ip(request_from("203.0.113.7", "10.0.0.1"), TRUSTED) == "203.0.113.7"
+
+
+def test_background_work_inside_queue_limit():
+    gate = LoginGate(lambda plain, hashed: True, workers=1, queue_limit=1)
+    release = threading.Event()
+    try:
+        futures = [gate.submit(release.wait) for _ in range(3)]
+        # one hashing, one queued, the third dropped
+        assert futures[2] is None
+        assert gate.counts["background_dropped"] == 1
+        assert gate.in_flight == 2
+    finally:
+        release.set()
+    for future in futures[:2]:
+        future.result(timeout=5)
+    # the done callbacks may run just after result() returns
+    deadline = time.monotonic() + 5
+    while gate.in_flight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert gate.in_flight == 0
+    gate.shutdown()
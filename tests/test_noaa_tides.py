@@ -0,0 +1,45 @@
+import datetime
+
+from application.utilities.NOAA_fetcher import NOAA_FETCHER
+from application.utilities.NOAA_tides import NOAA_TIDES
+from conftest import create_tides_data
+
+
+def create_tides(api_url):
+    tides = NOAA_TIDES(db=None)
+    tides.fetcher = NOAA_FETCHER(api_url=api_url, retries=0, timeout=5)
+    return tides
+
+
+def test_incremental_refresh_reports_outage(noaa_stub, today):
+    '''every station failing is reported, not passed off as the cached tides
+    '''
+    tides = create_tides(noaa_stub(failure_rate=1.0))
+    fetched = today - datetime.timedelta(days=3)
+    cached = create_tides_data(tides, tides.stations_dict, fetched - datetime.timedelta(days=1), tides.cache_days, fetched)
+
+    stations_tides_dict, high_water_marks, errors = tides.update_stations_tides_dict(cached)
+
+    assert set(errors) == set(tides.stations_dict)
+    assert tides.fetch_failed(errors)
+
+
+def test_incremental_refresh_partial_failure(noaa_stub, today):
+    tides = create_tides(noaa_stub())
+    fetched = today - datetime.timedelta(days=3)
+    cached = create_tides_data(tides, tides.stations_dict, fetched - datetime.timedelta(days=1), tides.cache_days, fetched)
+
+    # one station NOAA does not know
+    tides.stations_dict = dict(tides.stations_dict, Nowhere="not a station")
+    stations_tides_dict, high_water_marks, errors = tides.update_stations_tides_dict(cached)
+
+    assert set(errors) == {"Nowhere"}
+    assert not tides.fetch_failed(errors)
+    horizon = today + datetime.timedelta(days=tides.cache_days - 2)
+    assert all(high_water_marks[station] > horizon for station in cached["stations_tides_dict"])
+
+
+def test_create_tide_data_file_keeps_date():
+    tides = NOAA_TIDES(db=None)
+    date = datetime.datetime(2025, 3, 1, 1, 0)
+    assert tides.create_tide_data_file({}, date=date)["date"] == date
@@ -0,0 +1,37 @@
+import os
+
+from application.utilities.prerender import PRERENDER
+
+
+class Template():
+    def render(self, water_photo_name, tide_dict):
+        return f"{water_photo_name} {tide_dict}"
+
+
+def get_tide_page(station, time=None):
+    return "ocean3.png", {"station": station}
+
+
+def pages(directory):
+    return sorted(os.listdir(os.path.join(directory, "tide")))
+
+
+def test_one_worker_writes(tmp_path):
+    worker_one, worker_two = PRERENDER(str(tmp_path), Template()), PRERENDER(str(tmp_path), Template())
+    assert worker_one.render_stations(["Arletta", "Gig Harbor"], get_tide_page) == 2
+    assert worker_two.render_stations(["Arletta", "Gig Harbor"], get_tide_page) == 0
+    assert pages(tmp_path) == ["Arletta.html", "Gig Harbor.html"]
+
+    # the writer stops, its pages go, the other worker takes over on its next run
+    worker_one.stop()
+    assert pages(tmp_path) == []
+    assert worker_two.render_stations(["Arletta"], get_tide_page) == 1
+    assert pages(tmp_path) == ["Arletta.html"]
+    worker_two.stop()
+
+
+def test_clear_when_prerender_is_off(tmp_path):
+    PRERENDER(str(tmp_path), Template()).render_stations(["Arletta"], get_tide_page)
+    # a later start with prerender off, the writer above never stopped
+    assert PRERENDER(str(tmp_path), Template()).clear() == 1
+    assert pages(tmp_path) == []
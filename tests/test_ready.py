@@ -0,0 +1,50 @@
+import datetime
+
+from application.utilities.NOAA_fetcher import NOAA_FETCHER
+from conftest import create_tides_data, write_tides
+
+
+def test_refresh_during_outage_stays_stale(main, client, noaa_stub, today, monkeypatch):
+    '''a refresh while NOAA is down keeps the old cache and it still reads as stale
+    '''
+    tides = main.tides
+    fetched = today - datetime.timedelta(days=2)
+    write_tides(create_tides_data(tides, tides.stations_dict, fetched - datetime.timedelta(days=1),
+                                  tides.cache_days, fetched))
+    main.app.tide_store.reload()
+    assert main.tides_stale()
+
+    monkeypatch.setattr(tides, "fetcher", NOAA_FETCHER(api_url=noaa_stub(failure_rate=1.0), retries=0))
+    main.refresh_if_stale()
+
+    assert main.app.tide_store.date == fetched
+    assert main.tides_stale()
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] and response.json()["stale"]
+
+    # NOAA back
+    monkeypatch.setattr(tides, "fetcher", NOAA_FETCHER(api_url=noaa_stub(), retries=0))
+    main.refresh_if_stale()
+
+    assert not main.tides_stale()
+    assert client.get("/ready").json()["stale"] is False
+
+
+def test_tides_short_of_horizon_are_stale(main, today):
+    '''the date a cache was written does not make it fresh, the tides it holds do
+    '''
+    from application.utilities.tide_index import TideIndex
+
+    tides = main.tides
+    data = create_tides_data(tides, tides.stations_dict, today - datetime.timedelta(days=2), tides.cache_days)
+    stations = {station: TideIndex.from_station_dict(tide_dict)
+                for station, tide_dict in data["stations_tides_dict"].items()}
+    assert tides.tides_stale(stations)
+
+    data = create_tides_data(tides, tides.stations_dict, today - datetime.timedelta(days=1), tides.cache_days)
+    stations = {station: TideIndex.from_station_dict(tide_dict)
+                for station, tide_dict in data["stations_tides_dict"].items()}
+    assert not tides.tides_stale(stations)
+    del stations["Arletta"]
+    assert tides.tides_stale(stations)
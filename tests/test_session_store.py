@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from application.admin.session_store import SessionStore
+
+
+def session(last_use):
+    return {'token': b"token", 'last_use': last_use, 'persist_data': None}
+
+
+def test_capacity_evicts_longest_idle(tmp_path):
+    store = SessionStore(str(tmp_path / "log_users.pkl"), idle_seconds=3600, capacity=3)
+    start = datetime.now() - timedelta(minutes=10)
+    for minute, username in enumerate(["a", "b", "c"]):
+        store[username] = session(start + timedelta(minutes=minute))
+
+    # a is used again, b is now the longest idle, c logs out
+    store.touch("a", start + timedelta(minutes=5))
+    store.pop("c")
+    store["d"] = session(start + timedelta(minutes=6))
+    assert set(store.sessions) == {"a", "b", "d"}
+
+    store["e"] = session(start + timedelta(minutes=7))
+    assert set(store.sessions) == {"a", "d", "e"}
+    assert store.evicted == 1
+
+    # the stale heap entries for a (touched) and c (deleted) never evict or bring back anything
+    for minute, username in enumerate(["f", "g"], start=8):
+        store[username] = session(start + timedelta(minutes=minute))
+    assert set(store.sessions) == {"e", "f", "g"}
+    assert "c" not in store and store.get("c") is None
+
+
+def test_idle_sessions_are_evicted(tmp_path):
+    store = SessionStore(str(tmp_path / "log_users.pkl"), idle_seconds=60, capacity=10)
+    now = datetime.now()
+    store["idle"] = session(now - timedelta(seconds=61))
+    store["active"] = session(now)
+    assert set(store.sessions) == {"active"}
+
+
+def test_deleted_session_stays_deleted_through_heap_rebuilds(tmp_path):
+    store = SessionStore(str(tmp_path / "log_users.pkl"), idle_seconds=3600, capacity=5)
+    now = datetime.now()
+    store["gone"] = session(now)
+    store["kept"] = session(now)
+    del store["gone"]
+    # enough touches to rebuild the heap from the sessions
+    for second in range(200):
+        store.touch("kept", now + timedelta(seconds=second))
+    store.evict()
+    assert set(store.sessions) == {"kept"}
+    assert len(store._heap) <= 2 * len(store.sessions) + 64
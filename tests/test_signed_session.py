@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+import config
+from application.admin.signed_session import SessionDenylist, SignedSession
+from conftest import TEST_USER
+
+
+@pytest.fixture
+def signed(main, client, tmp_path, monkeypatch):
+    '''config.session_mode "signed" for the app the tests share, with its own denylist
+    '''
+    signed_sessions = SignedSession(main.authorize.crypto.keys, SessionDenylist(str(tmp_path / "session_denylist.json")))
+    monkeypatch.setattr(main.authorize, "signed_sessions", signed_sessions)
+    client.cookies.clear()
+    yield signed_sessions
+    client.cookies.clear()
+
+
+def get_test(client, cookie_value):
+    return client.get("/test", headers={"Cookie": f"{config.auth_cookie_name}={cookie_value.decode()}"})
+
+
+def session_cookie(signed, **times):
+    session = signed.decode(signed.create(TEST_USER, "user"))
+    session.update(times)
+    return signed.encode(session)
+
+
+def test_signed_cookie(signed, client):
+    response = get_test(client, signed.create(TEST_USER, "user"))
+    assert response.text == '"successfully got protected path"'
+
+
+def test_tampered_cookie_is_rejected(signed, client):
+    cookie_value = bytearray(signed.create(TEST_USER, "user"))
+    cookie_value[40] = ord("A") if cookie_value[40] != ord("A") else ord("B")
+    response = get_test(client, bytes(cookie_value))
+    assert "successfully" not in response.text
+    assert "code: no token" in response.text
+
+
+def test_cookie_past_max_age_is_rejected(signed, client):
+    now = int(time.time())
+    cookie_value = session_cookie(signed, iat=now - 3600 * config.session_max_age_hours - 1, lu=now)
+    response = get_test(client, cookie_value)
+    assert "Your session timed out" in response.text
+
+
+def test_logged_out_session_is_rejected(signed, client):
+    cookie_value = signed.create(TEST_USER, "user")
+    assert "successfully" in get_test(client, cookie_value).text
+
+    client.get("/logout", headers={"Cookie": f"{config.auth_cookie_name}={cookie_value.decode()}"})
+    client.cookies.clear()
+    response = get_test(client, cookie_value)
+    assert "You need to log in to continue" in response.text
+
+
+def test_cookie_reissued_after_reissue_seconds(signed, client):
+    now = int(time.time())
+    response = get_test(client, session_cookie(signed, lu=now - config.session_reissue_seconds + 5))
+    assert "successfully" in response.text
+    assert config.auth_cookie_name not in response.headers.get("set-cookie", "")
+
+    response = get_test(client, session_cookie(signed, lu=now - config.session_reissue_seconds - 1))
+    assert "successfully" in response.text
+    assert config.auth_cookie_name in response.headers.get("set-cookie", "")
+    # the new cookie, from the client's cookie jar, works
+    assert "successfully" in client.get("/test").text
@@ -0,0 +1,92 @@
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from application.utilities.static_assets import IMMUTABLE, REVALIDATE, STATIC_ASSETS
+
+
+CSS = b"body { color: navy; }\n" * 100
+
+
+@pytest.fixture
+def static_directory(tmp_path):
+    (tmp_path / "css").mkdir()
+    (tmp_path / "css" / "style.css").write_bytes(CSS)
+    (tmp_path / "css" / "style.css.gz").write_bytes(gzip.compress(CSS))
+    (tmp_path / "css" / "style.css.br").write_bytes(b"not really brotli")
+    (tmp_path / "img.png").write_bytes(b"\x89PNG" + bytes(range(256)) * 4)
+    return tmp_path
+
+
+def create_client(static_directory):
+    static_assets = STATIC_ASSETS(directory=str(static_directory), url_path="/static")
+    app = Starlette(routes=[Mount("/static", static_assets)])
+    return static_assets, TestClient(app)
+
+
+def test_nothing_hashed_at_start(static_directory):
+    static_assets, _ = create_client(static_directory)
+    assert static_assets.manifest == {}
+    url = static_assets.static_url("img.png")
+    assert url.startswith("/static/img.") and url != "/static/img.png"
+    assert list(static_assets.manifest) == ["img.png"]
+    assert static_assets.static_url("missing.png") == "/static/missing.png"
+
+
+def test_immutable_only_on_fingerprinted_urls(static_directory):
+    static_assets, client = create_client(static_directory)
+    response = client.get(static_assets.static_url("img.png"))
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE
+
+    response = client.get("/static/img.png")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == REVALIDATE
+
+
+def test_fingerprint_from_another_worker(static_directory):
+    url = create_client(static_directory)[0].static_url("img.png")
+    # a fresh worker that has not hashed anything yet
+    _, client = create_client(static_directory)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == IMMUTABLE
+
+    # an old hash of the file is not served as the new content
+    assert client.get("/static/img.0123456789.png").status_code == 404
+
+
+def test_if_none_match_is_304(static_directory):
+    static_assets, client = create_client(static_directory)
+    url = static_assets.static_url("img.png")
+    etag = client.get(url).headers["etag"]
+    response = client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+
+def test_compressed_sibling_by_accept_encoding(static_directory):
+    _, client = create_client(static_directory)
+    response = client.get("/static/css/style.css", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == CSS
+
+    response = client.get("/static/css/style.css", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+
+    response = client.get("/static/css/style.css", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == CSS
+
+
+def test_range_gets_the_uncompressed_file(static_directory):
+    _, client = create_client(static_directory)
+    response = client.get("/static/css/style.css", headers={"Accept-Encoding": "gzip, br", "Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert "content-encoding" not in response.headers
+    assert response.content == CSS[:10]
@@ -0,0 +1,20 @@
+import datetime
+
+
+def test_day_outside_horizon_is_404(main, client):
+    '''days outside the tide store are not built or cached, a crawler walking dates gets 404s
+    '''
+    main.app.tide_store.reload()
+    today = datetime.date.today()
+    response = client.get(f"/tide/Arletta/day/{today.isoformat()}.json", follow_redirects=True)
+    assert response.status_code == 200
+
+    entries = len(main.response_cache.entries)
+    for day in (today + datetime.timedelta(days=400), datetime.date(1999, 1, 1)):
+        response = client.get(f"/tide/Arletta/day/{day.isoformat()}.json")
+        assert response.status_code == 404
+    assert len(main.response_cache.entries) == entries
+
+
+def test_unknown_station_day_is_404(client):
+    assert client.get(f"/tide/Nowhere/day/{datetime.date.today().isoformat()}.json").status_code == 404
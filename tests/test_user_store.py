@@ -0,0 +1,79 @@
+import concurrent.futures
+import csv
+import logging
+import os
+
+import pytest
+
+from application.admin.user_store import USERS_DB_FIELDS, UserStore
+
+
+def write_users(file_path_name, usernames):
+    with open(file_path_name, "w", newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=USERS_DB_FIELDS)
+        writer.writeheader()
+        for username in usernames:
+            writer.writerow({"username": username, "full_name": "Test User", "email": f"{username}@example.com",
+                             "hashed_password": "old hash", "scope": "user", "disabled": "FALSE"})
+
+
+def temp_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".tmp")]
+
+
+@pytest.fixture
+def user_store(tmp_path):
+    file_path_name = str(tmp_path / "db_users.csv")
+    write_users(file_path_name, ["Tester"])
+    return UserStore(file_path_name)
+
+
+def test_update_hashed_password(user_store, tmp_path):
+    assert user_store.update_hashed_password("Tester", "new hash")
+    assert user_store.get("Tester")["hashed_password"] == "new hash"
+    assert temp_files(tmp_path) == []
+    assert not user_store.update_hashed_password("Nobody", "new hash")
+
+
+def test_update_hashed_password_failure_leaves_no_temp_file(user_store, tmp_path, monkeypatch):
+    def replace(source, destination):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", replace)
+    with pytest.raises(OSError):
+        user_store.update_hashed_password("Tester", "new hash")
+    assert temp_files(tmp_path) == []
+    assert user_store.get("Tester")["hashed_password"] == "old hash"
+
+
+def test_update_hashed_password_keeps_edits_since_reload(user_store):
+    '''a user added with user_login_utility after this worker last read the csv is not written over
+    '''
+    assert user_store.get("Tester") is not None
+    write_users(user_store.file_path_name, ["Tester", "Added"])
+    assert user_store.update_hashed_password("Tester", "new hash")
+    assert user_store.get("Added")["hashed_password"] == "old hash"
+    assert user_store.get("Tester")["hashed_password"] == "new hash"
+
+
+def test_update_hashed_password_two_workers(tmp_path):
+    '''two workers, each with its own table, rehash different users, both hashes are kept
+    '''
+    file_path_name = str(tmp_path / "db_users.csv")
+    write_users(file_path_name, ["One", "Two"])
+    worker_one, worker_two = UserStore(file_path_name), UserStore(file_path_name)
+    worker_one.get("One"), worker_two.get("Two")
+
+    assert worker_one.update_hashed_password("One", "hash one")
+    assert worker_two.update_hashed_password("Two", "hash two")
+    users = UserStore(file_path_name)
+    assert users.get("One")["hashed_password"] == "hash one"
+    assert users.get("Two")["hashed_password"] == "hash two"
+
+
+def test_rehash_failure_is_logged(main, caplog):
+    future = concurrent.futures.Future()
+    future.set_exception(OSError("disk full"))
+    with caplog.at_level(logging.ERROR, logger=main.logger.name):
+        main.log_rehash_failure(future)
+    assert "Rehash failed" in caplog.text
@@ -0,0 +1,23 @@
+import pytest
+
+import application.utilities.water_svg as water_svg
+
+
+@pytest.mark.parametrize("height", ["nan", "inf", "-inf", "NaN", "Infinity"])
+def test_water_not_finite_is_400(client, height):
+    assert client.get(f"/water/v{water_svg.WATER_SVG_VERSION}/{height}.svg").status_code == 400
+
+
+@pytest.mark.parametrize("height", [float("nan"), float("inf"), float("-inf")])
+def test_water_bucket_not_finite(height):
+    with pytest.raises(ValueError):
+        water_svg.water_bucket(height)
+
+
+def test_water_bucket_svg(client):
+    response = client.get(f"/water/v{water_svg.WATER_SVG_VERSION}/3.4.svg")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/svg+xml"
+    # out of range heights are clamped, the url redirects to the clamped bucket
+    response = client.get(f"/water/v{water_svg.WATER_SVG_VERSION}/99.svg", follow_redirects=False)
+    assert response.headers["location"] == f"/water/v{water_svg.WATER_SVG_VERSION}/{water_svg.WATER_SVG_MAX:.1f}.svg"
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+'''
+file name:  build_assets.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Offline build step for the tide page images.  Composites the beach with
+    each water level into one image, then writes AVIF, WebP and JPEG versions
+    at several widths with content hashed names plus a manifest that
+    tide.html reads to build its srcset.
+
+special instruction:
+    needs Pillow (pip install pillow), run from the repo root after changing
+    any image in application/static/img-site:
+        python tools/build_assets.py
+    output goes to application/static/img-build (not in git), old files are removed.
+    Until it has been run tide.html uses the original png layers.
+    AVIF is skipped if this Pillow build cannot write it.
+'''
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+
+from PIL import Image, features
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import application.utilities.tide_render as tide_render
+
+
+SOURCE_DIRECTORY = "application/static/img-site"
+BUILD_DIRECTORY = "application/static/img-build"
+BUILD_URL = "/static/img-build"
+BEACH_PHOTO_NAME = "beach_iphone.png"
+
+# artwork is 1179 wide, these cover 1x to 3x phones
+WIDTHS = (390, 780, 1179)
+
+QUALITY = {"avif": 55, "webp": 78, "jpeg": 82}
+PILLOW_FORMAT = {"avif": "AVIF", "webp": "WEBP", "jpeg": "JPEG"}
+EXTENSION = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+
+
+def composite(beach, water_photo_name):
+    '''beach with the water layer on top, as an opaque RGB image
+    '''
+    with Image.open(os.path.join(SOURCE_DIRECTORY, water_photo_name)) as water:
+        image = beach.convert("RGBA")
+        image.alpha_composite(water.convert("RGBA"))
+    return image.convert("RGB")
+
+
+def encode(image, image_format):
+    buffer = io.BytesIO()
+    image.save(buffer, PILLOW_FORMAT[image_format], quality=QUALITY[image_format])
+    return buffer.getvalue()
+
+
+def write_hashed(stem, image_format, body):
+    '''write body as <stem>.<hash>.<ext>, returns the file name
+    '''
+    digest = hashlib.sha1(body).hexdigest()[:10]
+    file_name = f"{stem}.{digest}.{EXTENSION[image_format]}"
+    with open(os.path.join(BUILD_DIRECTORY, file_name), 'wb') as file:
+        file.write(body)
+    return file_name
+
+
+def build_page(image, stem, formats, widths):
+    '''every format and width of one image, returns the manifest entry
+    {format: [{'width', 'url', 'bytes'}]}
+    '''
+    page = {}
+    for image_format in formats:
+        sources = []
+        for width in widths:
+            height = round(image.height * width / image.width)
+            body = encode(image.resize((width, height), Image.LANCZOS), image_format)
+            file_name = write_hashed(f"{stem}-{width}", image_format, body)
+            sources.append({"width": width, "url": f"{BUILD_URL}/{file_name}", "bytes": len(body)})
+        page[image_format] = sources
+    return page
+
+
+def build(widths=WIDTHS):
+    formats = ["webp", "jpeg"]
+    if features.check("avif"):
+        formats.insert(0, "avif")
+    else:
+        print("- Pillow cannot write AVIF, skipping it")
+
+    os.makedirs(BUILD_DIRECTORY, exist_ok=True)
+    for file_name in os.listdir(BUILD_DIRECTORY):
+        os.remove(os.path.join(BUILD_DIRECTORY, file_name))
+
+    manifest = {"widths": list(widths), "formats": formats, "pages": {}}
+
+    source_bytes = 0
+    build_bytes = 0
+
+    with Image.open(os.path.join(SOURCE_DIRECTORY, BEACH_PHOTO_NAME)) as beach:
+        beach.load()
+
+        for index in range(tide_render.WATER_PHOTO_MIN, tide_render.WATER_PHOTO_MAX + 1):
+            water_photo_name = tide_render.water_photo_name(index)
+            image = composite(beach, water_photo_name)
+            stem = os.path.splitext(water_photo_name)[0]
+
+            page = build_page(image, stem, formats, widths)
+            manifest["pages"][water_photo_name] = page
+
+            source_bytes += os.path.getsize(os.path.join(SOURCE_DIRECTORY, BEACH_PHOTO_NAME))
+            source_bytes += os.path.getsize(os.path.join(SOURCE_DIRECTORY, water_photo_name))
+            build_bytes += page[formats[0]][-1]["bytes"]
+
+            print(f"- {water_photo_name}: " + ", ".join(
+                f"{image_format} {page[image_format][-1]['bytes'] // 1024} KB" for image_format in formats))
+
+        # the beach alone, for the svg water layer (config.water_layer = "svg")
+        manifest["pages"][BEACH_PHOTO_NAME] = build_page(beach.convert("RGB"), "beach", formats, widths)
+
+    with open(os.path.join(BUILD_DIRECTORY, "manifest.json"), 'w') as file:
+        json.dump(manifest, file, indent=1)
+
+    print(f"\nfull width page images: {source_bytes // 1024} KB of png -> {build_bytes // 1024} KB of {formats[0]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="build composited tide page images")
+    parser.add_argument("--widths", type=int, nargs="+", default=WIDTHS)
+    args = parser.parse_args()
+
+    build(args.widths)
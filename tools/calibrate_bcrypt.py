@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+'''
+file name:  calibrate_bcrypt.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Times bcrypt on this host and picks the most rounds that hash within
+    config.bcrypt_target_seconds (each round doubles the time), then writes
+    bcrypt_rounds to config.py.  crypto.py and user_login_utility.py both
+    hash with it, and users with older hashes are rehashed when they next
+    log in, so changing it does not lock anyone out.
+
+special instruction:
+    run from the repo root on the server itself (a Pi is ~10x slower than a laptop):
+        python tools/calibrate_bcrypt.py
+        python tools/calibrate_bcrypt.py --target 0.5 --dry-run
+'''
+
+import argparse
+import os
+import re
+import statistics
+import sys
+import timeit
+
+from passlib.hash import bcrypt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+
+
+CONFIG_FILE_PATH_NAME = "config.py"
+
+MIN_ROUNDS = 10     # below this is too weak whatever the hardware
+MAX_ROUNDS = 16
+
+
+def time_rounds(rounds, repeat=3):
+    '''median seconds for one hash at rounds
+    '''
+    hasher = bcrypt.using(rounds=rounds)
+    return statistics.median(timeit.repeat(lambda: hasher.hash("calibrate bcrypt"), number=1, repeat=repeat))
+
+
+def calibrate(target_seconds):
+    '''returns (rounds, {rounds: seconds})
+    '''
+    timings = {}
+    rounds = MIN_ROUNDS
+    for _rounds in range(MIN_ROUNDS, MAX_ROUNDS + 1):
+        timings[_rounds] = time_rounds(_rounds)
+        print(f"- {_rounds} rounds: {1000 * timings[_rounds]:.0f} ms")
+        if timings[_rounds] > target_seconds:
+            break
+        rounds = _rounds
+    return rounds, timings
+
+
+def write_rounds(rounds, file_path_name=CONFIG_FILE_PATH_NAME):
+    with open(file_path_name) as file:
+        text = file.read()
+
+    text, count = re.subn(r"^bcrypt_rounds\s*=\s*\d+", f"bcrypt_rounds = {rounds}", text, flags=re.MULTILINE)
+    if count != 1:
+        raise ValueError(f"no bcrypt_rounds line in {file_path_name}")
+
+    with open(f"{file_path_name}.tmp", 'w') as file:
+        file.write(text)
+    os.replace(f"{file_path_name}.tmp", file_path_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pick bcrypt rounds for this host")
+    parser.add_argument("--target", type=float, default=config.bcrypt_target_seconds, help="seconds per hash")
+    parser.add_argument("--dry-run", action="store_true", help="do not write config.py")
+    args = parser.parse_args()
+
+    rounds, timings = calibrate(args.target)
+    print(f"\n{rounds} rounds, {1000 * timings[rounds]:.0f} ms per hash (target {1000 * args.target:.0f} ms, was {config.bcrypt_rounds})")
+
+    if not args.dry_run and rounds != config.bcrypt_rounds:
+        write_rounds(rounds)
+        print(f"- {CONFIG_FILE_PATH_NAME}: bcrypt_rounds = {rounds}, restart the server to use it")
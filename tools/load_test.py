@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+'''
+file name:  load_test.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Load test for the tide server.  Simulated phone clients (each with its
+    own cookies and client IP) send a mix of /tide/{station}, /index and
+    /login requests for a set time, then the throughput, p50/p95/p99 latency,
+    status codes and errors are reported for each kind of request, with a
+    line every --report-every seconds so a slow spell (the refresh) shows.
+
+    The NOAA stub (tools/noaa_stub.py) is started here with --noaa-latency
+    and --noaa-failure-rate, nothing goes to NOAA.
+
+special instruction:
+    run from the repo root.
+
+    Against a running server (the real thing, uvicorn and nginx):
+        set config.NOAA_api_url = "http://127.0.0.1:8099/api/datagetter" on the server
+        python tools/load_test.py --url http://127.0.0.1:8000 --clients 50 --duration 60 \
+            --user Tester --password ...
+
+    In this process (no uvicorn needed, the app and the clients share the CPU):
+        python tools/load_test.py --in-process --clients 50 --duration 60 --refresh-at 20
+    --refresh-at runs the scheduled NOAA refresh (the 1 AM job) that many
+    seconds into the run.  In process the app uses config's db_disk files,
+    as the server would.
+
+    Each client sends X-Forwarded-For with its own address so the /login rate
+    limits see separate phones (uvicorn trusts it from 127.0.0.1).  --think is
+    the mean pause between one client's requests, 0 sends as fast as it can.
+    Every client logs in as --user, past config.login_user_per_minute those
+    logins get a 429 from the login gate, that is the gate working (not an error).
+'''
+
+import argparse
+import asyncio
+import collections
+import os
+import random
+import sys
+import threading
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from tools.noaa_stub import create_server
+
+
+DEFAULT_MIX = "tide=8,index=1,login=1"
+
+
+def percentile(sorted_values, fraction):
+    '''nearest rank percentile of a sorted list
+    '''
+    if not sorted_values:
+        return None
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def parse_mix(mix):
+    '''"tide=8,index=1" to {"tide": 8.0, "index": 1.0}
+    '''
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name.strip() not in ("tide", "index", "login"):
+            raise argparse.ArgumentTypeError(f"unknown request kind in --mix: {name}")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+class Results():
+    def __init__(self):
+        self.latency = collections.defaultdict(list)        # kind: [seconds]
+        self.statuses = collections.defaultdict(collections.Counter)    # kind: {status: count}
+        self.errors = collections.Counter()                 # kind: exceptions and 5xx
+        self.window = []                                     # (seconds, error) since the last report
+
+    def record(self, kind, seconds, status):
+        error = status is None or isinstance(status, str) or status >= 500
+        self.latency[kind].append(seconds)
+        self.statuses[kind][status] += 1
+        if error:
+            self.errors[kind] += 1
+        self.window.append((seconds, error))
+
+    def report_window(self, elapsed, interval):
+        window, self.window = self.window, []
+        latency = sorted(seconds for seconds, _ in window)
+        p95 = percentile(latency, 0.95)
+        print(f"{elapsed:6.0f} s  {len(window) / interval:8.1f} req/s  "
+              f"p95 {1000 * p95 if p95 is not None else 0:8.1f} ms  "
+              f"errors {sum(error for _, error in window)}", flush=True)
+
+    def report(self, duration):
+        print(f"\n{'kind':8s} {'count':>7s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'errors':>7s}  status")
+        all_latency = []
+        for kind in sorted(self.latency):
+            latency = sorted(self.latency[kind])
+            all_latency.extend(latency)
+            self.print_row(kind, latency, duration, self.errors[kind], self.statuses[kind])
+        self.print_row("total", sorted(all_latency), duration, sum(self.errors.values()), {})
+
+    def print_row(self, kind, latency, duration, errors, statuses):
+        p50, p95, p99 = (1000 * percentile(latency, fraction) if latency else 0 for fraction in (0.5, 0.95, 0.99))
+        status_text = " ".join(f"{status}:{count}" for status, count in sorted(statuses.items(), key=str))
+        print(f"{kind:8s} {len(latency):7d} {len(latency) / duration:8.1f} {p50:8.1f} {p95:8.1f} {p99:8.1f} {errors:7d}  {status_text}")
+
+
+async def run_client(client, args, weights, stations, results, stop_time):
+    '''one phone, its cookies stay in client
+    '''
+    kinds = list(weights)
+    kind_weights = list(weights.values())
+    while time.monotonic() < stop_time:
+        kind = random.choices(kinds, kind_weights)[0]
+        start = time.monotonic()
+        try:
+            if kind == "tide":
+                response = await client.get(f"/tide/{random.choice(stations)}")
+            elif kind == "index":
+                response = await client.get("/index")
+            else:
+                response = await client.post("/login", data={"username": args.user, "password": args.password})
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        results.record(kind, time.monotonic() - start, status)
+
+        if args.think:
+            await asyncio.sleep(random.expovariate(1 / args.think))
+
+
+async def report_windows(results, interval, start_time, stop_time):
+    while time.monotonic() < stop_time:
+        await asyncio.sleep(interval)
+        results.report_window(time.monotonic() - start_time, interval)
+
+
+def create_clients(args, transport_for):
+    clients = []
+    for number in range(args.clients):
+        address = f"10.{number // 65536 % 256}.{number // 256 % 256}.{number % 256}"
+        clients.append(httpx.AsyncClient(
+            transport=transport_for(address),
+            base_url=args.url,
+            headers={"X-Forwarded-For": address},
+            follow_redirects=False,     # /login answers 302 with the cookie
+            timeout=args.timeout,
+            ))
+    return clients
+
+
+async def run_load(args, weights, app=None, refresh=None):
+    '''returns Results, app is run in this process when given
+    '''
+    stations = list(config.NOAA_tide_stations)
+    results = Results()
+
+    if app is not None:
+        # the ASGI client address stands in for X-Forwarded-For
+        transport_for = lambda address: httpx.ASGITransport(app=app, client=(address, 50000))
+    else:
+        limits = httpx.Limits(max_connections=1)
+        transport_for = lambda address: httpx.AsyncHTTPTransport(limits=limits)
+    clients = create_clients(args, transport_for)
+
+    start_time = time.monotonic()
+    stop_time = start_time + args.duration
+    tasks = [run_client(client, args, weights, stations, results, stop_time) for client in clients]
+    tasks.append(report_windows(results, args.report_every, start_time, stop_time))
+    if refresh is not None and args.refresh_at is not None:
+        tasks.append(run_refresh(refresh, args.refresh_at))
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for client in clients:
+            await client.aclose()
+
+    results.report(time.monotonic() - start_time)
+    return results
+
+
+async def run_refresh(refresh, delay):
+    await asyncio.sleep(delay)
+    print("---- NOAA refresh started", flush=True)
+    start = time.monotonic()
+    await asyncio.to_thread(refresh)
+    print(f"---- NOAA refresh done in {time.monotonic() - start:.1f} s", flush=True)
+
+
+async def run_in_process(args, weights):
+    '''the app in this process, lifespan included, NOAA pointed at the stub
+    '''
+    config.NOAA_api_url = f"http://127.0.0.1:{args.noaa_port}/api/datagetter"
+    import application.main as main
+
+    async with main.app.router.lifespan_context(main.app):
+        return await run_load(args, weights, app=main.app, refresh=main.scheduled_task)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tide server load test")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server to test (ignored with --in-process)")
+    parser.add_argument("--in-process", action="store_true", help="run the app in this process")
+    parser.add_argument("--clients", type=int, default=20, help="simulated phones")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds between a client's requests, 0 for none")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help=f"request weights (default {DEFAULT_MIX})")
+    parser.add_argument("--user", help="username for /login, login is left out of the mix without it")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds per request")
+    parser.add_argument("--report-every", type=float, default=5, help="seconds between progress lines")
+    parser.add_argument("--refresh-at", type=float, help="with --in-process, run the NOAA refresh this many seconds in")
+    parser.add_argument("--noaa-port", type=int, default=8099)
+    parser.add_argument("--noaa-latency", type=float, default=0.2, help="NOAA stub seconds per response")
+    parser.add_argument("--noaa-failure-rate", type=float, default=0.0, help="NOAA stub fraction answered 503")
+    args = parser.parse_args()
+
+    weights = dict(args.mix)
+    if args.user is None and weights.pop("login", None) is not None:
+        print("no --user, /login left out of the mix")
+    if not weights:
+        parser.error("nothing left in --mix")
+    if args.in_process:
+        args.url = "http://tides.test"
+
+    stub = create_server(port=args.noaa_port, latency=args.noaa_latency, failure_rate=args.noaa_failure_rate)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    print(f"NOAA stub on http://127.0.0.1:{args.noaa_port}/api/datagetter")
+    print(f"{args.clients} clients for {args.duration:.0f} s against {args.url}, mix {weights}\n")
+
+    try:
+        if args.in_process:
+            results = asyncio.run(run_in_process(args, weights))
+        else:
+            results = asyncio.run(run_load(args, weights))
+    finally:
+        stub.shutdown()
+        stub.server_close()
+
+    return 1 if sum(results.errors.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
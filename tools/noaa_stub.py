@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+'''
+file name:  noaa_stub.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Local stand in for the NOAA CO-OPS datagetter API so tide refreshes can be
+    run and timed offline.  Answers hilo prediction requests with synthetic
+    (repeatable) tides in the same JSON format as NOAA.
+
+special instruction:
+    run from the repo root:
+        python tools/noaa_stub.py --port 8099 --latency 0.2 --failure-rate 0.1
+    then set in config.py:
+        NOAA_api_url = "http://127.0.0.1:8099/api/datagetter"
+
+    --failure-rate returns a 503 for that fraction of requests (the fetcher retries these)
+'''
+
+import argparse
+import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import math
+import random
+import time
+from urllib.parse import urlparse, parse_qs
+
+
+# average time between a high and a low
+HALF_TIDE_MINUTES = 372
+
+
+def create_predictions(station_ID, begin_date, time_range):
+    '''synthetic hilo predictions, the same for a given station and date
+    time_range is in hours
+    '''
+    try:
+        start = datetime.datetime.strptime(begin_date, "%Y%m%d %H:%M")
+    except ValueError:
+        start = datetime.datetime.strptime(begin_date, "%Y%m%d")
+    end = start + datetime.timedelta(hours=time_range)
+
+    # start every station at a fixed point in its cycle so results repeat
+    epoch_minutes = int((start - datetime.datetime(2000, 1, 1)).total_seconds() / 60)
+    cycle = epoch_minutes // HALF_TIDE_MINUTES
+    _time = datetime.datetime(2000, 1, 1) + datetime.timedelta(minutes=cycle * HALF_TIDE_MINUTES + int(station_ID) % 97)
+
+    predictions = []
+    while _time < end:
+        # heights drift slowly so each day looks a little different
+        is_high = cycle % 2 == 0
+        swing = 4.0 * math.sin(cycle / 14.0)
+        height = (12.0 + swing / 2) if is_high else (2.0 - swing / 2)
+
+        if _time >= start:
+            predictions.append({
+                "t": _time.strftime("%Y-%m-%d %H:%M"),
+                "v": f"{height:.3f}",
+                "type": "H" if is_high else "L",
+            })
+
+        cycle += 1
+        _time += datetime.timedelta(minutes=HALF_TIDE_MINUTES)
+
+    return predictions
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    failure_rate = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if url.path != "/api/datagetter":
+            return self.send_json(404, {"error": {"message": "not found"}})
+
+        if random.random() < self.failure_rate:
+            return self.send_json(503, {"error": {"message": "stub failure"}})
+
+        try:
+            predictions = create_predictions(query["station"], query["begin_date"], int(query["range"]))
+        except (KeyError, ValueError) as e:
+            # NOAA answers bad requests with a 200 and an error message
+            return self.send_json(200, {"error": {"message": f"bad request: {e}"}})
+
+        self.send_json(200, {"predictions": predictions})
+
+    def send_json(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # keep the console quiet, timing runs print their own results
+        pass
+
+
+def create_server(host="127.0.0.1", port=8099, latency=0.0, failure_rate=0.0):
+    '''returns a ThreadingHTTPServer, call serve_forever() (or run it in a thread)
+    '''
+    handler = type("StubHandler", (StubHandler,), {"latency": latency, "failure_rate": failure_rate})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NOAA datagetter stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port, args.latency, args.failure_rate)
+    print(f"NOAA stub on http://{args.host}:{args.port}/api/datagetter")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+'''
+file name:  precompress_static.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Writes .gz (and .br if the brotli package is installed) next to the css,
+    js, svg ... files in application/static so /static can send them
+    compressed without compressing on every request.
+
+special instruction:
+    run from the repo root after changing a static file:
+        python tools/precompress_static.py
+    only files that changed are recompressed, the siblings are not in git.
+'''
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import application.utilities.static_assets as static_assets
+
+
+STATIC_DIRECTORY = "application/static"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="precompress static files")
+    parser.add_argument("--directory", default=STATIC_DIRECTORY)
+    args = parser.parse_args()
+
+    if static_assets.brotli is None:
+        print("- brotli is not installed, writing .gz only")
+    written = static_assets.precompress(args.directory)
+    print(f"- {written} compressed files written")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+'''
+file name:  rotate_fernet_key.py
+date created: March 2025
+created by:  Brad Allen
+project/support:  cs50             # root or script it supports
+description:
+    Rotates the Fernet key used for the auth cookie.  The new key becomes the
+    primary and the old ones still decrypt, so logged in users stay logged in.
+    Running workers pick up the new key file by themselves.
+
+special instruction:
+    run from the repo root:
+        python tools/rotate_fernet_key.py            new primary key, keep 2 old keys
+        python tools/rotate_fernet_key.py --keep 1
+        python tools/rotate_fernet_key.py --retire   drop the old keys (after config.cookie_expire)
+        python tools/rotate_fernet_key.py --create   first key, if there is no key file
+'''
+
+import argparse
+import os
+import sys
+
+from cryptography.fernet import Fernet
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from application.admin.key_manager import KeyManager, write_keys
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="rotate the auth cookie Fernet key")
+    parser.add_argument("--file", default=config.fernet_key_file_path_name)
+    parser.add_argument("--keep", type=int, default=2, help="old keys that still decrypt")
+    parser.add_argument("--retire", action="store_true", help="keep only the primary key")
+    parser.add_argument("--create", action="store_true", help="write a first key")
+    args = parser.parse_args()
+
+    if args.create:
+        if os.path.exists(args.file):
+            sys.exit(f"{args.file} already exists")
+        write_keys([Fernet.generate_key()], args.file)
+        print(f"- created {args.file}")
+        sys.exit()
+
+    keys = KeyManager(args.file)
+    if args.retire:
+        keys.retire()
+        print(f"- {args.file}: old keys removed")
+    else:
+        keys.rotate(args.keep)
+        print(f"- {args.file}: new primary key, {len(keys.keys) - 1} old keys still accepted")
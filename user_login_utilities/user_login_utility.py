@@ -12,20 +12,30 @@ special instruction:
 1. The full output file must have "TEMP" in it
 2. This overwrites the input file so if it's screwed up then it messes that file up
 3. Must use the specific titles shown
+4. For thousands of users use --bulk, it streams the csv, hashes on every core,
+   and only replaces db_users.csv when it has finished.  If it is stopped,
+   run it again and it carries on from the last checkpoint.
+	python user_login_utility.py --bulk [--workers N]
 '''
 
 
+import argparse
 import copy
 import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-# the next two lines must be same as used in crypto.py
-from passlib.context import CryptContext
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# the same password context as crypto.py (config.bcrypt_rounds)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from application.admin.crypto import pwd_context
 
 def get_password_hash(password):
 	'''this must be identical to the method in crypto.py
 	'''
-    return pwd_context.hash(password)
+	return pwd_context.hash(password)
 
 def process_users_csv(file_path_name):
 	'''  Reads the db_users.csv file created using Numbers/Excel then saved as csv.
@@ -69,25 +79,177 @@ def write_csv(_db, file_path_name):
 	'''
 	# Writing to CSV file row by row
 	with open(file_path_name, 'w', newline='') as file:
-	    writer = csv.writer(file)
-
-	    # write label row
-	    title_row = ['username','full_name','email', 'password', 'hashed_password', 'scope', 'disabled']
-	    if "TEMP" in file_path_name:
-	    	pass
-	    else:
-	    	title_row.remove("password")
-	    writer.writerow(title_row)
-
-	    # write data rows
-	    for username, data_dict in _db.items():
-	    	_row = []
-	    	for key, value in data_dict.items():
-	    		if key in title_row:
-		    		_row.append(value)
-    		writer.writerow(_row)
+		writer = csv.writer(file)
+
+		# write label row
+		title_row = ['username','full_name','email', 'password', 'hashed_password', 'scope', 'disabled']
+		if "TEMP" in file_path_name:
+			pass
+		else:
+			title_row.remove("password")
+		writer.writerow(title_row)
+
+		# write data rows
+		for username, data_dict in _db.items():
+			_row = []
+			for key, value in data_dict.items():
+				if key in title_row:
+					_row.append(value)
+			writer.writerow(_row)
+
+
+# #### bulk mode
+USERS_DB_TITLES = ['username','full_name','email', 'password', 'hashed_password', 'scope', 'disabled']
+BULK_BATCH_ROWS = 16		# rows hashed between checkpoints, per worker
+
+
+def hash_row(row):
+	'''runs in the worker processes, returns the row with hashed_password filled in
+	'''
+	if row.get("hashed_password") in ('', None):
+		row["hashed_password"] = get_password_hash(row.get("password"))
+	return row
+
+
+def read_checkpoint(checkpoint_path_name, input_stat):
+	'''rows already written and the partial file sizes, empty if there is nothing to resume
+	'''
+	try:
+		with open(checkpoint_path_name) as file:
+			checkpoint = json.load(file)
+	except (FileNotFoundError, ValueError):
+		return {}
+
+	# a different input file, start again
+	if checkpoint.get("input") != [input_stat.st_size, input_stat.st_mtime_ns]:
+		return {}
+	return checkpoint
+
+
+def write_checkpoint(checkpoint_path_name, checkpoint):
+	with open(f"{checkpoint_path_name}.tmp", 'w') as file:
+		json.dump(checkpoint, file)
+	os.replace(f"{checkpoint_path_name}.tmp", checkpoint_path_name)
+
+
+def open_partial(file_path_name, title_row, size):
+	'''open <file>.partial to append, cut back to the last checkpoint (size) or started new
+	'''
+	partial_path_name = f"{file_path_name}.partial"
+	if size and os.path.exists(partial_path_name):
+		file = open(partial_path_name, 'r+', newline='')
+		file.truncate(size)
+		file.seek(size)
+	else:
+		file = open(partial_path_name, 'w', newline='')
+		csv.writer(file).writerow(title_row)
+	return file
+
+
+def print_progress(done, total, start, resumed):
+	rate = (done - resumed) / max(time.monotonic() - start, 1e-6)
+	eta = (total - done) / rate if rate else 0
+	print(f"\r- {done}/{total} users, {rate:.1f}/s, {eta / 60:.1f} min left   ", end='', flush=True)
+
+
+def bulk_process_users_csv(file_path_name, output_path_name, temp_output_path_name, workers=None):
+	'''process_users_csv + write_csv for large user lists
+
+	Streams the input, hashes missing passwords across a process pool and
+	appends to <output>.partial files, checkpointing after each batch.  The
+	outputs are only replaced (os.replace) at the end, so the input file is
+	never half written, and a stopped run resumes from its checkpoint.
+	returns the number of users written
+	'''
+	workers = workers or os.cpu_count() or 1
+	checkpoint_path_name = f"{output_path_name}.checkpoint"
+
+	input_stat = os.stat(file_path_name)
+	checkpoint = read_checkpoint(checkpoint_path_name, input_stat)
+	done = checkpoint.get("rows", 0)
+	if done and not (os.path.exists(f"{temp_output_path_name}.partial") and os.path.exists(f"{output_path_name}.partial")):
+		# stopped while the outputs were being renamed, start again
+		checkpoint = {}
+		done = 0
+	if done:
+		print(f"- resuming after {done} users")
+
+	with open(file_path_name, newline='') as file:
+		total = sum(1 for row in csv.DictReader(file) if row.get("username"))
+
+	temp_title_row = USERS_DB_TITLES
+	title_row = [title for title in USERS_DB_TITLES if title != "password"]
+
+	temp_output = open_partial(temp_output_path_name, temp_title_row, checkpoint.get("temp_output_bytes"))
+	output = open_partial(output_path_name, title_row, checkpoint.get("output_bytes"))
+	temp_writer = csv.writer(temp_output)
+	writer = csv.writer(output)
+
+	start = time.monotonic()
+	resumed = done
+	with open(file_path_name, newline='') as file, ProcessPoolExecutor(max_workers=workers) as executor:
+		rows = (row for row in csv.DictReader(file) if row.get("username"))
+		# skip what was written before the checkpoint
+		for _ in range(done):
+			next(rows)
+
+		batch = []
+		for row in rows:
+			batch.append({title: row.get(title) for title in USERS_DB_TITLES})
+			if len(batch) < BULK_BATCH_ROWS * workers:
+				continue
+			done = write_batch(executor, batch, temp_writer, writer, temp_title_row, title_row, done)
+			write_checkpoint(checkpoint_path_name, {
+				"input": [input_stat.st_size, input_stat.st_mtime_ns],
+				"rows": done,
+				"temp_output_bytes": sync(temp_output),
+				"output_bytes": sync(output),
+			})
+			print_progress(done, total, start, resumed)
+			batch = []
+
+		if batch:
+			done = write_batch(executor, batch, temp_writer, writer, temp_title_row, title_row, done)
+
+	sync(temp_output)
+	sync(output)
+	temp_output.close()
+	output.close()
+	print_progress(done, total, start, resumed)
+	print()
+
+	os.replace(f"{temp_output_path_name}.partial", temp_output_path_name)
+	os.replace(f"{output_path_name}.partial", output_path_name)
+	if os.path.exists(checkpoint_path_name):
+		os.remove(checkpoint_path_name)
+	return done
+
+
+def write_batch(executor, batch, temp_writer, writer, temp_title_row, title_row, done):
+	'''hash a batch in the pool (in order) and append it to both outputs
+	'''
+	for row in executor.map(hash_row, batch, chunksize=BULK_BATCH_ROWS // 4):
+		temp_writer.writerow([row.get(title) for title in temp_title_row])
+		writer.writerow([row.get(title) for title in title_row])
+		done += 1
+	return done
+
+
+def sync(file):
+	'''flush to disk, returns the file size for the checkpoint
+	'''
+	file.flush()
+	os.fsync(file.fileno())
+	return file.tell()
+
 
 if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description="hash passwords and write db_users.csv")
+	parser.add_argument("--bulk", action="store_true", help="stream, hash on every core, resumable")
+	parser.add_argument("--workers", type=int, default=None, help="bulk hashing processes (default: cores)")
+	parser.add_argument("--input", default="db_users.csv")
+	args = parser.parse_args()
+
 	print("\n>>>> Running user_login_utility.py <<<<<")
 	print("This will overwrite your current input file (db_users.csv)")
 	confirm = input("Do you want to proceed (y or n)?: ")
@@ -96,7 +258,12 @@ if __name__ == "__main__":
 		exit()
 
 
-	file_path_name = "db_users.csv"
+	if args.bulk:
+		_count = bulk_process_users_csv(args.input, "db_users.csv", "db_users_TEMP.csv", args.workers)
+		print(f"\n{_count} users written to db_users.csv and db_users_TEMP.csv")
+		exit()
+
+	file_path_name = args.input
 	users_db, users_db_TEMP = process_users_csv(file_path_name)
 
 	# print results